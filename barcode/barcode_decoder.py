@@ -0,0 +1,248 @@
+""" ISO/IEC 15434 / ANSI MH10.8.2 barcode decoder
+
+Decodes 2D barcodes like the ones on Digi-Key bags and reels:
+
+    [)>{RS}06{GS}P296-1234-1-ND{GS}1PSN74LVC1G04DBVR{GS}Q10{RS}{EOT}
+
+Scanners deliver the separators either as literal control characters or,
+depending on keyboard emulation settings, as {RS}/{GS}/{EOT} text. Both are
+handled by the same regular expression in a single pass over the barcode,
+without rewriting the escapes first. Every data element is kept,
+including data identifiers (DIs) that aren't in the table.
+
+DATA_IDENTIFIERS is partial: it has the DIs found on parts and shipping
+labels and none of the C, F, G, H, I, M, N, R, U or W categories. Other
+DIs end up in BarcodeRecord.unknown and describe() names their category.
+
+No argparse or global state here so this can be imported by the scanning
+scripts and by bulk tools that decode millions of logged scans.
+"""
+import re
+from collections import namedtuple
+
+# https://www.eurodatacouncil.org/images/documents/ANS_MH10.8.2%20_CM_20140512.pdf
+# Names are the keys of BarcodeRecord.fields, so each one must be unique;
+# DIs with the same meaning carry the DI in their name.
+DATA_IDENTIFIERS = {
+    # B - Containers
+    "B": "Container Type",
+    "1B": "Returnable Container ID",
+    "2B": "Gas Cylinder Container ID",
+    # D - Dates
+    "D": "Date",
+    "1D": "Date (DDMMYY)",
+    "2D": "Date (MMDDYY)",
+    "3D": "Date (YDDD)",
+    "4D": "Date 4D (YYMMDD)",
+    "5D": "Date 5D (YYMMDD)",
+    "6D": "Date 6D (YYYYMMDD)",
+    "7D": "Date 7D (YYYYWW)",
+    "8D": "Date (YYYYMMDDHHMM)",
+    "9D": "Date Code",
+    "10D": "Date Code (YYWW)",
+    "11D": "Date 11D (YYYYWW)",
+    "12D": "Date 12D (YYYYMMDD)",
+    "14D": "Expiration Date (YYYYMMDD)",
+    "15D": "Best Before Date (YYYYMMDD)",
+    "16D": "Production Date (YYYYMMDD)",
+    # E - Environmental
+    "E": "Environmental Controls",
+    "13E": "Lead Free / RoHS",
+    # J - License plates
+    "J": "License Plate",
+    "1J": "License Plate (Lowest Level)",
+    "2J": "License Plate (Highest Level)",
+    "5J": "License Plate (Mixed Load)",
+    # K - Transaction references
+    "K": "Customer PO Number",
+    "1K": "Supplier Order Number",
+    "2K": "Bill of Lading Number",
+    "3K": "Master Bill of Lading Number",
+    "4K": "Customer PO Line",
+    "5K": "Shipment Reference",
+    "6K": "Pro Number",
+    "7K": "Carrier Bill of Lading",
+    "9K": "Supplier Order Line",
+    "10K": "Invoice Number",
+    "11K": "Packing List Number",
+    "12K": "Quotation Number",
+    "13K": "Work Order Number",
+    "14K": "Document Number 14K",
+    "15K": "Kanban Number",
+    "16K": "Delivery Number",
+    # L - Locations
+    "L": "Storage Location",
+    "1L": "Location",
+    "2L": "Ship To Location",
+    "3L": "Ship From Location",
+    "4L": "Country of Origin",
+    "20L": "Ship To Address",
+    # P - Item information
+    "P": "Part No.",
+    "1P": "Supplier Part Number",
+    "2P": "Revision Level",
+    "3P": "Supplier Code and Part Number",
+    "4P": "UPC/EAN",
+    "5P": "Nomenclature",
+    "6P": "Part Number and Serial Number",
+    "7P": "Prefix Part Number",
+    "8P": "GTIN",
+    "10P": "Hazardous Material Code",
+    "11P": "Component Revision Level",
+    "12P": "Document Number 12P",
+    "13P": "Drawing Number",
+    "14P": "Part Number (Alternative)",
+    "20P": "Customer Part Number",
+    "30P": "Supplier Part Number (Alternative)",
+    # Q - Quantities
+    "Q": "Quantity",
+    "1Q": "Length",
+    "2Q": "Theoretical Length/Weight",
+    "3Q": "Unit of Measure",
+    "4Q": "Net Weight",
+    "7Q": "Quantity and Unit of Measure",
+    "8Q": "Gross Weight",
+    "11Q": "Number of Containers",
+    "12Q": "Quantity in Units",
+    # S - Serial numbers
+    "S": "Serial Number",
+    "1S": "Additional Serial Number",
+    "2S": "Advance Shipping Notice Number",
+    "3S": "Package ID",
+    "4S": "Package ID (Unique)",
+    "25S": "Unique Item Identifier",
+    # T - Traceability
+    "T": "Traceability Number",
+    "1T": "Lot Number",
+    "2T": "Traceability Number (Alternative)",
+    "20T": "Lot Number (Alternative)",
+    # V - Parties
+    "V": "Supplier Code",
+    "1V": "Supplier ID",
+    "2V": "Supplier DUNS Number",
+    "3V": "Supplier ID (Party)",
+    "12V": "Manufacturer ID",
+    # Z - Mutually defined (Digi-Key uses these internally)
+    "Z": "Mutually Defined",
+    "11Z": "Mutually Defined 11Z",
+    "12Z": "Mutually Defined 12Z",
+    "13Z": "Mutually Defined 13Z",
+    "20Z": "Mutually Defined 20Z",
+}
+
+# Category of a DI by its letter, for DIs that aren't in the table
+DATA_IDENTIFIER_CATEGORIES = {
+    "B": "Containers",
+    "C": "Containers (Alternative)",
+    "D": "Dates",
+    "E": "Environmental",
+    "F": "Field Continuation",
+    "G": "Preliminary",
+    "H": "Human Resources",
+    "I": "Vehicle",
+    "J": "License Plates",
+    "K": "Transaction References",
+    "L": "Locations",
+    "M": "Miscellaneous",
+    "N": "Industry Assigned",
+    "P": "Item Information",
+    "Q": "Quantities",
+    "R": "Miscellaneous",
+    "S": "Traceability (Serial)",
+    "T": "Traceability (Lot/Batch)",
+    "U": "Units",
+    "V": "Parties",
+    "W": "Work in Progress",
+    "Z": "Mutually Defined",
+}
+
+RS = "\x1e"
+GS = "\x1d"
+EOT = "\x04"
+FS = "\x1c"
+US = "\x1f"
+
+ESCAPES = {"{RS}": RS, "{GS}": GS, "{EOT}": EOT, "{FS}": FS, "{US}": US}
+
+# Either spelling of a separator
+separator_re = re.compile(r"\{(?:RS|GS|EOT|FS|US)\}|[\x1c\x1d\x1e\x1f\x04]")
+
+# [)> RS 06 GS, some scanners add a leading '>' to either part and some
+# leave out the RS
+header_re = re.compile(r">?\[\)>(?:\x1e|\{RS\})?>?([0-9]{2})(?=\x1d|\{GS\})")
+
+# One data element: GS, the DI and the value up to the next separator. An
+# element without a DI matches with an empty DI. findall() over the whole
+# barcode is the tokenizer, one pass whichever separators the scanner sent.
+data_element_re = re.compile(
+    r"(?:\x1d|\{GS\})((?:[0-9]{0,3}[A-Z])?)"
+    r"([^{\x1c-\x1f\x04]*(?:\{(?!(?:RS|GS|EOT|FS|US)\})[^{\x1c-\x1f\x04]*)*)"
+)
+
+BarcodeRecord = namedtuple("BarcodeRecord", ["format", "elements", "fields", "unknown", "invalid"])
+BarcodeRecord.__doc__ = """Decoded barcode
+
+format   -- format header, e.g. "06"
+elements -- every (DI, value) pair in barcode order
+fields   -- {name: value} for DIs in DATA_IDENTIFIERS
+unknown  -- (DI, value) pairs for DIs not in DATA_IDENTIFIERS
+invalid  -- sections that aren't a DI followed by a value
+"""
+
+
+def to_control_chars(barcode):
+    """Replace {RS}-style escapes with the real control characters"""
+    if "{" not in barcode:
+        return barcode
+    return separator_re.sub(lambda m: ESCAPES.get(m.group(0), m.group(0)), barcode)
+
+
+def describe(di):
+    """Name of a DI, or its category if it isn't in the table"""
+    if di in DATA_IDENTIFIERS:
+        return DATA_IDENTIFIERS[di]
+    category = DATA_IDENTIFIER_CATEGORIES.get(di[-1:])
+    if category:
+        return "Unknown {} DI".format(category)
+    return "Unknown DI"
+
+
+def decode(barcode):
+    """Decode one ISO/IEC 15434 barcode, raising ValueError if it isn't one"""
+    barcode = barcode.strip()
+    header = header_re.match(barcode)
+    if not header:
+        raise ValueError("Invalid barcode!")
+
+    elements = []
+    fields = {}
+    unknown = []
+    invalid = []
+
+    for di, value in data_element_re.findall(barcode, header.end()):
+        if not di:
+            if value:
+                invalid.append(value)
+            continue
+
+        elements.append((di, value))
+        name = DATA_IDENTIFIERS.get(di)
+        if name:
+            fields[name] = value
+        else:
+            unknown.append((di, value))
+
+    return BarcodeRecord(header.group(1), elements, fields, unknown, invalid)
+
+
+def decode_many(barcodes):
+    """Decode an iterable of barcodes
+
+    Yields (barcode, record) with record None for anything that isn't a
+    valid ISO/IEC 15434 barcode, so large scan logs can be streamed.
+    """
+    for barcode in barcodes:
+        try:
+            yield barcode, decode(barcode)
+        except ValueError:
+            yield barcode, None
@@ -1,65 +1,61 @@
 import argparse
-import re
-import subprocess
-import tempfile
-import time
-import os
+import contextlib
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
-from dkbc.dkbc import DKBC
-from inventory_label.inventory_label import InventoryLabel
+from barcode_decoder import decode, describe, to_control_chars
+from dk_cache import DEFAULT_CACHE_PATH, CachedDKBC, DigiKeyCache
+from label_printer import LabelPrinter
+from scan_timing import ScanTimer
 
-iso_iec_15434_start = re.compile("^>?\[\)>(\{RS\})?[>]?[0-9]{2}{GS}")
-# https://www.eurodatacouncil.org/images/documents/ANS_MH10.8.2%20_CM_20140512.pdf
-ansi_mh10_8_2_item = re.compile("(?P<DI>[0-9]*[A-Z])(?P<value>[A-Za-z0-9\-\.\ ]*)")
+# Set up by main(). Other scripts can import this module and set dkbc to
+# anything with DKBC's process_barcode() and get_part_details() methods.
+debug = False
+dkbc = None
+printer = None
+timer = None
 
-known_dis = {
-    "K": "Customer PO Number",
-    "1K": "Supplier Order Number",
-    "10K": "Invoice Number",
-    "P": "Part No.",
-    "1P": "Supplier Part Number",
-    "Q": "Quantity",
-    "4L": "Country of Origin",
-}
+# One InventoryLabel (and loaded font) per rendering thread
+inventory_labels = threading.local()
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--batch", action="store_true", help="Batch scan")
-parser.add_argument("--print", action="store_true", help="Print label")
-parser.add_argument("--debug", action="store_true", help="Debug mode")
-args = parser.parse_args()
 
-dkbc = DKBC()
+def timed(stage):
+    """Time a stage of the current scan with --timing"""
+    if timer is None:
+        return contextlib.nullcontext()
+    return timer.stage(stage)
 
 
 def decode_barcode(barcode):
-    # Check for valid code first
-    if not iso_iec_15434_start.match(barcode):
-        raise ValueError("Invalid barcode!")
-
-    fields = {}
-    sections = barcode.split("{GS}")
-    for section in sections[1:]:
-        match = ansi_mh10_8_2_item.match(section)
-        if match:
-            di = match.group("DI")
-            value = match.group("value")
-
-            if di in known_dis:
-                fields[known_dis[di]] = value
-            elif args.debug:
-                print("NEW DI!", di, value)
-        elif args.debug:
+    record = decode(barcode)
+
+    if debug:
+        for di, value in record.unknown:
+            print("NEW DI!", di, describe(di), value)
+        for section in record.invalid:
             print("Invalid section", section)
 
-    return fields
+    return record.fields
 
 
-def dk_search_for_part(part_no):
+def dk_search_for_part(part_no, interactive=True):
     digikey_data = dkbc.get_part_details(part_no)
     index = -1
 
+    if digikey_data["ProductsCount"] == 0:
+        raise LookupError("No matches for {}".format(part_no))
+
     # Only prompt user if there's more than one item
     if digikey_data["ProductsCount"] > 1:
+        if not interactive:
+            raise LookupError(
+                "{} matches for {}, needs an interactive choice".format(
+                    digikey_data["ProductsCount"], part_no
+                )
+            )
+
         print(
             "{:3s} | {:30s} | {:6s} | {:20s}".format(
                 "ID", "Digi-key Part Number", "MOQ", "Packaging",
@@ -82,40 +78,32 @@ def dk_search_for_part(part_no):
 
     return digikey_data["Products"][index]
 
-scanning = True
-
-while scanning:
-    if args.batch:
-        scanning = True
-    else:
-        scanning = False
-
-    barcode = input("Scan barcode:")
 
+def lookup(barcode, interactive=True):
     try:
-        fields = decode_barcode(barcode)
-
-        # TODO - use other digikey api when scanning non-dk barcodes
-        barcode = barcode.replace("{RS}", "\x1e")
-        barcode = barcode.replace("{GS}", "\x1d")
-        barcode = barcode.replace("{EOT}", "\x04")
-        digikey_data = dkbc.process_barcode(barcode)
+        with timed("decode"):
+            fields = decode_barcode(barcode)
+        barcode = to_control_chars(barcode)
     except ValueError:
         fields = None
-        simple_code = None
+
+    # TODO - use other digikey api when scanning non-dk barcodes
+    with timed("api"):
         digikey_data = dkbc.process_barcode(barcode)
 
     if "ErrorMessage" in digikey_data:
         print(digikey_data["ErrorMessage"])
+        if not fields or "Supplier Part Number" not in fields:
+            raise LookupError(digikey_data["ErrorMessage"])
         print(f"Trying to search for {fields['Supplier Part Number']} instead")
-        digikey_data = dk_search_for_part(fields["Supplier Part Number"])
+        # Includes the time spent choosing a part at the prompt
+        with timed("search"):
+            digikey_data = dk_search_for_part(fields["Supplier Part Number"], interactive)
 
-    if args.debug:
-        if fields:
-            pprint(fields)
-        pprint(digikey_data)
+    return fields, digikey_data
 
 
+def make_label(digikey_data):
     new_code = [
         "[)>\u001e06",
         "1P" + digikey_data["ManufacturerPartNumber"],
@@ -132,39 +120,236 @@ while scanning:
 
     print(digikey_data["ManufacturerPartNumber"] + " " + description)
 
-    temp_dir = tempfile.mkdtemp(prefix="barcode_")
-    label_filename = os.path.join(temp_dir, "barcode.png")
-    if args.debug:
-        print("Temp file", label_filename)
+    if not hasattr(inventory_labels, "label"):
+        from inventory_label.inventory_label import InventoryLabel
+
+        inventory_labels.label = InventoryLabel(font_name="Andale Mono.ttf")
 
-    label = InventoryLabel(font_name="Andale Mono.ttf")
-    label.create_label(
+    # Render to memory, the name lets PIL pick the image format
+    label_file = io.BytesIO()
+    label_file.name = "barcode.png"
+    inventory_labels.label.create_label(
         digikey_data["ManufacturerPartNumber"],
         description,
         reduced_barcode.encode("ascii"),
-        label_filename,
-        debug=args.debug,
+        label_file,
+        debug=debug,
     )
 
+    return label_file.getvalue()
+
+
+def print_label(label):
+    if printer is not None:
+        printer.add(label)
+
+
+def process_scan(barcode, interactive=True):
+    if timer is not None:
+        timer.start_scan(barcode)
+
+    error = None
+    try:
+        fields, digikey_data = lookup(barcode, interactive)
+
+        if debug:
+            if fields:
+                pprint(fields)
+            pprint(digikey_data)
+
+        with timed("render"):
+            return make_label(digikey_data)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if timer is not None:
+            timer.end_scan(error)
+
+
+def scan_serial(batch):
+    scanning = True
+
+    while scanning:
+        if batch:
+            scanning = True
+        else:
+            scanning = False
+
+        try:
+            barcode = input("Scan barcode:")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+
+        try:
+            label = process_scan(barcode)
+        except LookupError as e:
+            # Unknown part or, offline, not cached; carry on with the next scan
+            print(e)
+            continue
+
+        print_label(label)
+
+
+def scan_pipelined(workers, queue_size):
+    """Batch scanning where lookups, rendering and printing happen in the
+    background so the next scan is accepted straight away.
+
+    Scans are handed to a thread pool as they come in. A printer thread
+    takes the results in scan order, so labels come out in the order the
+    parts were scanned, and reports failed scans without stopping. At most
+    queue_size scans are outstanding; past that the scan prompt waits.
+    """
+    pending = queue.Queue(maxsize=queue_size)
+
+    def printer():
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+
+            scan_number, barcode, future = item
+            try:
+                label = future.result()
+            except Exception as e:
+                print("Scan {} failed ({!r}): {}".format(scan_number, barcode, e))
+                continue
+
+            # Keep taking scans off the queue or the scan prompt would wait
+            # on it forever
+            try:
+                print_label(label)
+            except Exception as e:
+                print("Printing scan {} failed ({!r}): {}".format(scan_number, barcode, e))
+
+    printer_thread = threading.Thread(target=printer, name="printer")
+    printer_thread.start()
+
+    scan_number = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                try:
+                    barcode = input("Scan barcode:")
+                except (EOFError, KeyboardInterrupt):
+                    print()
+                    break
+
+                if not barcode.strip():
+                    continue
+
+                scan_number += 1
+                future = executor.submit(process_scan, barcode, False)
+                pending.put((scan_number, barcode, future))
+    finally:
+        # Let everything already scanned finish printing
+        pending.put(None)
+        printer_thread.join()
+
+
+def main():
+    global debug, dkbc, printer, timer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", action="store_true", help="Batch scan")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Batch scan with lookups, rendering and printing in the background",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Lookup/render threads for --pipeline"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Maximum scans waiting to be processed in --pipeline mode",
+    )
+    parser.add_argument("--print", action="store_true", help="Print label")
+    parser.add_argument(
+        "--print-batch",
+        type=int,
+        default=1,
+        help="Send labels to the printer as one job per this many labels",
+    )
+    parser.add_argument(
+        "--print-window",
+        type=float,
+        default=5.0,
+        help="Print a partial batch once its first label has waited this many seconds",
+    )
+    parser.add_argument("--debug", action="store_true", help="Debug mode")
+    parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH, help="Digi-Key lookup cache (SQLite file)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Don't cache lookups")
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=30,
+        help="Days before a cached lookup is fetched again",
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=10000, help="Maximum number of cached lookups"
+    )
+    parser.add_argument(
+        "--offline", action="store_true", help="Only use cached lookups, never the API"
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="Time each stage of every scan and print a latency summary on exit",
+    )
+    parser.add_argument(
+        "--timing-log", help="Append per-scan timings to this JSON Lines file (implies --timing)"
+    )
+    args = parser.parse_args()
+
+    if args.no_cache:
+        if args.offline:
+            parser.error("--offline needs the cache")
+        from dkbc.dkbc import DKBC
+
+        cache = None
+        dkbc = DKBC()
+    else:
+        cache = DigiKeyCache(args.cache, args.cache_ttl * 24 * 3600, args.cache_size)
+        if args.offline:
+            dkbc = CachedDKBC(None, cache, offline=True)
+        else:
+            from dkbc.dkbc import DKBC
+
+            dkbc = CachedDKBC(DKBC(), cache)
+
+    if args.timing or args.timing_log:
+        timer = ScanTimer(args.timing_log)
+
     if args.print:
-        result = subprocess.run(
-            [
-                "lp",
-                "-d",
-                "Brother_QL_570",
-                "-o",
-                "media=Custom.62x23mm",
-                "-o",
-                "fit-to-page",
-                "-o",
-                "orientation-requested=3",
-                label_filename,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+        printer = LabelPrinter(
+            args.print_batch,
+            args.print_window,
+            on_job=timer.print_job if timer is not None else None,
         )
 
-        if result.returncode:
-            print("Error printing {}".format(label_filename))
+    debug = args.debug
+
+    try:
+        if args.pipeline:
+            scan_pipelined(args.workers, args.queue_size)
+        else:
+            scan_serial(args.batch)
+    finally:
+        if printer is not None:
+            printer.close()
+        if timer is not None:
+            print(timer.summary())
+            timer.close()
+
+    if cache is not None and (args.batch or args.pipeline):
+        print(cache.stats())
+
 
-    os.remove(label_filename)
+if __name__ == "__main__":
+    main()
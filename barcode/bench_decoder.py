@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+""" Benchmark barcode_decoder on a synthetic scan log
+
+Generates Digi-Key style ISO/IEC 15434 barcodes, half with {GS}-style
+escapes and half with literal control characters, and reports decode
+throughput. The escaped half is also run through the regex + str.split
+decoder barcode_print used before, which only understood the escapes.
+
+Example usage:
+bench_decoder.py --barcodes 200000
+"""
+import argparse
+import random
+import re
+import time
+
+from barcode_decoder import decode, decode_many
+
+legacy_start = re.compile(r"^>?\[\)>(\{RS\})?[>]?[0-9]{2}{GS}")
+legacy_item = re.compile(r"(?P<DI>[0-9]*[A-Z])(?P<value>[A-Za-z0-9\-\.\ ]*)")
+legacy_dis = {
+    "K": "Customer PO Number",
+    "1K": "Supplier Order Number",
+    "10K": "Invoice Number",
+    "P": "Part No.",
+    "1P": "Supplier Part Number",
+    "Q": "Quantity",
+    "4L": "Country of Origin",
+}
+
+
+def decode_legacy(barcode):
+    if not legacy_start.match(barcode):
+        raise ValueError("Invalid barcode!")
+
+    fields = {}
+    for section in barcode.split("{GS}")[1:]:
+        match = legacy_item.match(section)
+        if match and match.group("DI") in legacy_dis:
+            fields[legacy_dis[match.group("DI")]] = match.group("value")
+    return fields
+
+
+def make_barcode(rng, escaped):
+    elements = [
+        "P{}-{}-1-ND".format(rng.randint(100, 999), rng.randint(1000, 99999)),
+        "1PSN74LVC1G{:02d}DBVR".format(rng.randint(0, 99)),
+        "K",
+        "1K{}".format(rng.randint(10 ** 7, 10 ** 8)),
+        "10K{}".format(rng.randint(10 ** 7, 10 ** 8)),
+        "9D{:02d}{:02d}".format(rng.randint(15, 25), rng.randint(1, 52)),
+        "1T{}".format(rng.randint(10 ** 5, 10 ** 6)),
+        "11K1",
+        "4LCN",
+        "Q{}".format(rng.randint(1, 5000)),
+        "11ZPICK",
+        "12Z{}".format(rng.randint(10 ** 6, 10 ** 7)),
+        "13Z{}".format(rng.randint(10 ** 5, 10 ** 6)),
+        "20Z" + "0" * 40,
+    ]
+    if escaped:
+        return "[)>{RS}06{GS}" + "{GS}".join(elements) + "{RS}{EOT}"
+    return "[)>\x1e06\x1d" + "\x1d".join(elements) + "\x1e\x04"
+
+
+def each(fn, barcodes):
+    for barcode in barcodes:
+        fn(barcode)
+
+
+def bench(name, fn, barcodes):
+    start = time.perf_counter()
+    fn(barcodes)
+    elapsed = time.perf_counter() - start
+    print(
+        "{:10s} {:10.1f} ms {:12.0f} barcodes/s".format(
+            name, elapsed * 1000, len(barcodes) / elapsed
+        )
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark barcode decoding.")
+    parser.add_argument("--barcodes", type=int, default=100000, help="Number of barcodes")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    escaped = [make_barcode(rng, True) for _ in range(args.barcodes // 2)]
+    literal = [make_barcode(rng, False) for _ in range(args.barcodes - len(escaped))]
+
+    # The new decoder must agree with the old one on the DIs it knew
+    for barcode in escaped[:1000]:
+        fields = decode(barcode).fields
+        for name, value in decode_legacy(barcode).items():
+            assert fields[name] == value, (barcode, name)
+
+    legacy_time = bench("legacy", lambda b: each(decode_legacy, b), escaped)
+    new_time = bench("escaped", lambda b: each(decode, b), escaped)
+    bench("literal", lambda b: each(decode, b), literal)
+    bench("bulk", lambda b: sum(1 for _ in decode_many(b)), escaped + literal)
+
+    print("Escaped vs legacy: {:.2f}x".format(legacy_time / new_time))
+
+
+if __name__ == "__main__":
+    main()
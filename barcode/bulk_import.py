@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+""" Bulk import of logged barcode scans
+
+Reads barcodes from a text file (one per line) or a CSV file (the
+"barcode" column, or the first column), looks up each distinct barcode once
+and writes one inventory record per barcode as CSV or JSON Lines. Records
+are written as soon as each lookup finishes, so a long import can be
+followed with tail -f and an interrupted one keeps what it has done.
+
+Lookups go through barcode_print, with either the Digi-Key API (cached as
+in barcode_print) or a local JSON fixture as the backend.
+
+Example usage:
+bulk_import.py scans.txt --output inventory.csv
+bulk_import.py scans.csv --backend fixture --fixture dk.json --output inventory.jsonl
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import barcode_print
+from dk_cache import DEFAULT_CACHE_PATH, CachedDKBC, DigiKeyCache, normalize_barcode
+from dk_fixture import FixtureDKBC
+
+OUTPUT_FIELDS = [
+    "barcode",
+    "scans",
+    "digikey_part_number",
+    "manufacturer_part_number",
+    "description",
+    "quantity",
+    "error",
+]
+
+
+def read_barcodes(path, column=None):
+    """Yield barcodes from a text or CSV file"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if not path.lower().endswith(".csv"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+            return
+
+        reader = csv.reader(f)
+        index = 0
+        for row_number, row in enumerate(reader):
+            if row_number == 0:
+                header = [cell.strip().lower() for cell in row]
+                if column is not None:
+                    if column.isdigit():
+                        index = int(column)
+                    else:
+                        index = header.index(column.lower())
+                        continue
+                elif "barcode" in header:
+                    index = header.index("barcode")
+                    continue
+
+            if index < len(row) and row[index].strip():
+                yield row[index].strip()
+
+
+def dedupe(barcodes):
+    """{normalized barcode: [first barcode as scanned, number of scans]}"""
+    unique = {}
+    for barcode in barcodes:
+        entry = unique.setdefault(normalize_barcode(barcode), [barcode, 0])
+        entry[1] += 1
+    return unique
+
+
+class RecordWriter:
+    def __init__(self, output, output_format):
+        self.output = output
+        self.output_format = output_format
+        if output_format == "csv":
+            self.writer = csv.DictWriter(output, OUTPUT_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.output_format == "csv":
+            self.writer.writerow(record)
+        else:
+            self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+
+def import_barcode(barcode, scans, label_dir=None):
+    record = dict.fromkeys(OUTPUT_FIELDS, "")
+    record["barcode"] = barcode
+    record["scans"] = scans
+
+    try:
+        fields, digikey_data = barcode_print.lookup(barcode, interactive=False)
+        record["digikey_part_number"] = digikey_data["DigiKeyPartNumber"]
+        record["manufacturer_part_number"] = digikey_data["ManufacturerPartNumber"]
+        record["description"] = digikey_data.get("ProductDescription", "")
+        if fields:
+            record["quantity"] = fields.get("Quantity", "")
+
+        if label_dir is not None:
+            filename = re.sub(r"[^A-Za-z0-9._-]", "_", record["digikey_part_number"]) + ".png"
+            with open(os.path.join(label_dir, filename), "wb") as f:
+                f.write(barcode_print.make_label(digikey_data))
+    except Exception as e:
+        record["error"] = str(e) or type(e).__name__
+
+    return record
+
+
+def bulk_import(barcodes, output, output_format="csv", workers=1, label_dir=None):
+    """Look up each distinct barcode once and write a record for it
+
+    Returns (scans, unique barcodes, errors).
+    """
+    unique = dedupe(barcodes)
+    scans = sum(count for _, count in unique.values())
+
+    writer = RecordWriter(output, output_format)
+    errors = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map() keeps the input order
+        for record in executor.map(
+            lambda entry: import_barcode(entry[0], entry[1], label_dir), unique.values()
+        ):
+            writer.write(record)
+            if record["error"]:
+                errors += 1
+
+    return scans, len(unique), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up logged barcode scans in bulk.")
+    parser.add_argument("input", help="Text file with one barcode per line, or CSV file")
+    parser.add_argument(
+        "--column",
+        help="CSV column name, or index for files without a header row (default: barcode or the first)",
+    )
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "jsonl"],
+        help="Output format (default: from the output file extension, else csv)",
+    )
+    parser.add_argument(
+        "--backend", choices=["dkbc", "fixture"], default="dkbc", help="Where lookups come from"
+    )
+    parser.add_argument("--fixture", help="JSON file for --backend fixture")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent lookups")
+    parser.add_argument("--labels", help="Also render a PNG label per part into this directory")
+    parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH, help="Digi-Key lookup cache (SQLite file)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Don't cache lookups")
+    parser.add_argument(
+        "--offline", action="store_true", help="Only use cached lookups, never the API"
+    )
+    parser.add_argument("--debug", action="store_true", help="Debug mode")
+    args = parser.parse_args()
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "jsonl" if args.output and args.output.endswith((".jsonl", ".json")) else "csv"
+
+    cache = None
+    if args.backend == "fixture":
+        if not args.fixture:
+            parser.error("--backend fixture needs --fixture")
+        barcode_print.dkbc = FixtureDKBC(args.fixture)
+    elif args.no_cache:
+        if args.offline:
+            parser.error("--offline needs the cache")
+        from dkbc.dkbc import DKBC
+
+        barcode_print.dkbc = DKBC()
+    else:
+        cache = DigiKeyCache(args.cache)
+        if args.offline:
+            barcode_print.dkbc = CachedDKBC(None, cache, offline=True)
+        else:
+            from dkbc.dkbc import DKBC
+
+            barcode_print.dkbc = CachedDKBC(DKBC(), cache)
+    barcode_print.debug = args.debug
+
+    if args.labels:
+        os.makedirs(args.labels, exist_ok=True)
+
+    barcodes = read_barcodes(args.input, args.column)
+    if args.output:
+        output = open(args.output, "w", encoding="utf-8", newline="")
+    else:
+        output = sys.stdout
+
+    # barcode_print reports progress on stdout, keep that out of the records
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            scans, unique, errors = bulk_import(
+                barcodes, output, output_format, args.workers, args.labels
+            )
+        finally:
+            if args.output:
+                output.close()
+
+    print(
+        "Imported {} scans, {} distinct barcodes, {} errors".format(scans, unique, errors),
+        file=sys.stderr,
+    )
+    if cache is not None:
+        print(cache.stats(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
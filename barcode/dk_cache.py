@@ -0,0 +1,136 @@
+""" On-disk cache for Digi-Key API lookups
+
+Responses are stored in SQLite keyed by normalized barcode or by supplier
+part number, expire after a TTL and are evicted least recently used first
+once the cache holds more than max_entries. Error responses are kept too,
+for a shorter error_ttl: a barcode Digi-Key doesn't know goes straight to
+the part search fallback next time, and a transient error is soon retried.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from barcode_decoder import to_control_chars
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "barcode_print", "digikey.sqlite")
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a lookup isn't cached"""
+
+
+def normalize_barcode(barcode):
+    return to_control_chars(barcode.strip())
+
+
+def normalize_part_number(part_no):
+    return part_no.strip().upper()
+
+
+class DigiKeyCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=30 * 24 * 3600, max_entries=10000, error_ttl=3600):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # The connection is shared by the --pipeline worker threads
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (kind, key))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)")
+        self.db.commit()
+
+    def get(self, kind, key, allow_expired=False):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, created FROM lookups WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value = json.loads(row[0])
+            ttl = self.error_ttl if "ErrorMessage" in value else self.ttl
+            if not allow_expired and time.time() - row[1] > ttl:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.db.execute(
+                "UPDATE lookups SET accessed = ? WHERE kind = ? AND key = ?",
+                (time.time(), kind, key),
+            )
+            self.db.commit()
+            return value
+
+    def put(self, kind, key, value):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO lookups (kind, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(value), now, now),
+            )
+
+            # Evict least recently used entries over the limit
+            self.db.execute(
+                "DELETE FROM lookups WHERE rowid IN ("
+                " SELECT rowid FROM lookups ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.db.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        return "Cache: {} hits, {} misses ({:.0f}% hit rate)".format(self.hits, self.misses, rate)
+
+
+class CachedDKBC:
+    """Wraps DKBC so lookups are served from the cache when possible
+
+    With offline=True the wrapped client is never called (it can be None)
+    and uncached lookups raise CacheMiss. Expired entries are still served
+    when offline.
+    """
+
+    def __init__(self, dkbc, cache, offline=False):
+        self.dkbc = dkbc
+        self.cache = cache
+        self.offline = offline
+
+    def _lookup(self, kind, key, fetch):
+        value = self.cache.get(kind, key, allow_expired=self.offline)
+        if value is not None:
+            return value
+
+        if self.offline:
+            raise CacheMiss("{} not cached: {}".format(kind, key.encode("unicode_escape").decode()))
+
+        value = fetch()
+        self.cache.put(kind, key, value)
+        return value
+
+    def process_barcode(self, barcode):
+        return self._lookup(
+            "barcode", normalize_barcode(barcode), lambda: self.dkbc.process_barcode(barcode)
+        )
+
+    def get_part_details(self, part_no):
+        return self._lookup(
+            "part", normalize_part_number(part_no), lambda: self.dkbc.get_part_details(part_no)
+        )
@@ -0,0 +1,45 @@
+""" Digi-Key lookups from a local JSON file
+
+Stands in for DKBC when there's no network or API key, e.g. to reprocess
+scan logs or try out changes to the label layout. The file holds the API
+responses keyed the same way as the lookup cache:
+
+    {
+        "barcodes": {"[)>\\u001e06\\u001dP296-1234-1-ND...": {...}},
+        "parts": {"SN74LVC1G04DBVR": {"ProductsCount": 1, "Products": [...]}}
+    }
+
+Barcodes may be written with either {GS}-style escapes or control
+characters.
+"""
+import json
+
+from dk_cache import normalize_barcode, normalize_part_number
+
+
+class FixtureDKBC:
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.barcodes = {
+            normalize_barcode(barcode): value
+            for barcode, value in data.get("barcodes", {}).items()
+        }
+        self.parts = {
+            normalize_part_number(part_no): value
+            for part_no, value in data.get("parts", {}).items()
+        }
+
+    def process_barcode(self, barcode):
+        value = self.barcodes.get(normalize_barcode(barcode))
+        if value is None:
+            # Same as the API, so the caller falls back to a part search
+            return {"ErrorMessage": "Barcode not in fixture"}
+        return value
+
+    def get_part_details(self, part_no):
+        value = self.parts.get(normalize_part_number(part_no))
+        if value is None:
+            return {"ProductsCount": 0, "Products": []}
+        return value
@@ -0,0 +1,125 @@
+""" Batched label printing
+
+Instead of one CUPS job (and one printer wake-up) per label, rendered labels
+are collected and submitted as a single multi-page job every batch_size
+labels, or once the oldest waiting label has waited window seconds.
+Labels are kept in memory and the job is piped to lp's standard input.
+"""
+import io
+import subprocess
+import threading
+import time
+
+LP_COMMAND = [
+    "lp",
+    "-d",
+    "Brother_QL_570",
+    "-o",
+    "media=Custom.62x23mm",
+    "-o",
+    "fit-to-page",
+    "-o",
+    "orientation-requested=3",
+]
+
+
+def combine_labels(labels):
+    """Combine PNG labels into one multi-page PDF"""
+    from PIL import Image
+
+    pages = [Image.open(io.BytesIO(label)).convert("RGB") for label in labels]
+    pdf = io.BytesIO()
+    pages[0].save(pdf, "PDF", save_all=True, append_images=pages[1:])
+    return pdf.getvalue()
+
+
+class LabelPrinter:
+    def __init__(self, batch_size=1, window=5.0, command=LP_COMMAND, on_job=None):
+        self.batch_size = batch_size
+        self.window = window
+        self.command = command
+        # Called with (number of labels, seconds lp took) after each job
+        self.on_job = on_job
+
+        self.labels = []
+        self.oldest = None
+        self.jobs = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.print_lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self._flush_on_timeout, name="label-printer", daemon=True)
+        self.thread.start()
+
+    def add(self, label):
+        """Queue one rendered PNG label"""
+        with self.condition:
+            self.labels.append(label)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            full = len(self.labels) >= self.batch_size
+            self.condition.notify()
+
+        if full:
+            self.flush()
+
+    def _flush_on_timeout(self):
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                if self.oldest is None:
+                    self.condition.wait()
+                    continue
+
+                remaining = self.oldest + self.window - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+
+            self.flush()
+
+    def _print(self, labels):
+        if not labels:
+            return
+
+        # A failed job is reported and dropped, it mustn't take down the
+        # scanning or timer thread that flushed it
+        try:
+            if len(labels) == 1:
+                data = labels[0]
+            else:
+                data = combine_labels(labels)
+
+            start = time.monotonic()
+            result = subprocess.run(
+                self.command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except Exception as e:
+            print("Error printing {} labels: {}".format(len(labels), e))
+            return
+        self.jobs += 1
+        if self.on_job is not None:
+            self.on_job(len(labels), time.monotonic() - start)
+
+        if result.returncode:
+            print("Error printing {} labels: {}".format(len(labels), result.stderr.decode().strip()))
+
+    def flush(self):
+        """Print the waiting labels now"""
+        # The labels are taken under the condition but combined and sent to
+        # lp outside it, so a job in progress doesn't stop labels from being
+        # queued. print_lock sends jobs one at a time, in the order their
+        # labels were taken
+        with self.print_lock:
+            with self.condition:
+                labels, self.labels, self.oldest = self.labels, [], None
+            self._print(labels)
+
+    def close(self):
+        """Stop the timer thread and print anything still waiting"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.flush()
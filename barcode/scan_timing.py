@@ -0,0 +1,133 @@
+""" Per-stage latency instrumentation for barcode_print
+
+Each scan is timed stage by stage (decode, Digi-Key API, part search,
+label rendering) and every print job's lp run is timed on its own, since
+one job can hold several labels. Latencies go into log-scale histograms so
+a long session uses constant memory, and can also be appended to a JSON
+Lines file, one record per scan or print job.
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ["decode", "api", "search", "render", "lp", "total"]
+
+
+class LatencyHistogram:
+    """Log-scale histogram, percentiles are accurate to about 5%"""
+
+    BUCKETS_PER_DOUBLING = 8
+    # Smallest bucket, anything faster is counted here
+    MIN_LATENCY = 1e-5
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds > self.MIN_LATENCY:
+            bucket = int(math.log2(seconds / self.MIN_LATENCY) * self.BUCKETS_PER_DOUBLING)
+        else:
+            bucket = 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+
+        rank = math.ceil(self.count * percent / 100.0)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Middle of the bucket, never more than the largest sample
+                middle = self.MIN_LATENCY * 2 ** ((bucket + 0.5) / self.BUCKETS_PER_DOUBLING)
+                return min(middle, self.max)
+        return self.max
+
+
+class ScanTimer:
+    def __init__(self, log_path=None):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.scans = 0
+        self.errors = 0
+        self.print_jobs = 0
+
+        # Scans are processed in parallel with --pipeline, each by one thread
+        self.current = threading.local()
+        self.lock = threading.Lock()
+        self.log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def start_scan(self, barcode):
+        self.current.scan = {"time": time.time(), "barcode": barcode}
+        self.current.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            scan = getattr(self.current, "scan", None)
+            if scan is not None:
+                scan[name] = scan.get(name, 0.0) + time.perf_counter() - start
+
+    def end_scan(self, error=None):
+        scan = self.current.scan
+        scan["total"] = time.perf_counter() - self.current.start
+        self.current.scan = None
+        if error is not None:
+            scan["error"] = str(error)
+
+        with self.lock:
+            self.scans += 1
+            if error is not None:
+                self.errors += 1
+            for stage in STAGES:
+                if stage in scan:
+                    self.histograms[stage].add(scan[stage])
+            self._log(scan)
+
+    def print_job(self, labels, seconds):
+        """Called by LabelPrinter after each lp run"""
+        with self.lock:
+            self.print_jobs += 1
+            self.histograms["lp"].add(seconds)
+            self._log({"time": time.time(), "labels": labels, "lp": seconds})
+
+    def _log(self, record):
+        if self.log is not None:
+            self.log.write(json.dumps(record) + "\n")
+            self.log.flush()
+
+    def summary(self):
+        lines = [
+            "{} scans ({} failed), {} print jobs".format(self.scans, self.errors, self.print_jobs),
+            "{:8s} {:>7s} {:>10s} {:>10s} {:>10s}".format("stage", "count", "p50 ms", "p95 ms", "max ms"),
+        ]
+        for stage in STAGES:
+            histogram = self.histograms[stage]
+            if not histogram.count:
+                continue
+            lines.append(
+                "{:8s} {:7d} {:10.1f} {:10.1f} {:10.1f}".format(
+                    stage,
+                    histogram.count,
+                    histogram.percentile(50) * 1000,
+                    histogram.percentile(95) * 1000,
+                    histogram.max * 1000,
+                )
+            )
+        return "\n".join(lines)
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,117 @@
+'''
+Content-addressed store for exported Obsidian attachments.
+
+Each attachment is stored once under a name derived from the hash of its
+contents, so the same screenshot embedded in several notes is only copied
+once and re-exporting a vault doesn't copy anything that is already there.
+Files are placed with a reflink where the filesystem supports it and
+copied otherwise. Hardlinks are opt-in (hardlinks=True): a hardlink shares
+its inode with the vault copy, so editing the attachment in place would
+silently change the file stored under the old hash.
+'''
+import os
+import errno
+import shutil
+import hashlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# From linux/fs.h
+FICLONE = 0x40049409
+
+HASH_LENGTH = 16
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache(object):
+    """hash_file, remembering the hash of each (path, size, mtime)."""
+
+    def __init__(self):
+        # (path, size, mtime) -> hash, so each source is only hashed once
+        self.hashes = {}
+
+    def __call__(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self.hashes:
+            self.hashes[key] = hash_file(path)
+        return self.hashes[key]
+
+
+def reflink(source, destination):
+    """Clone source into destination sharing extents (Linux btrfs/xfs)."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, 'reflink not supported')
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(destination)
+            raise
+    shutil.copystat(source, destination)
+
+
+class AttachmentStore(object):
+    def __init__(self, image_output_dir, hardlinks=False):
+        self.image_output_dir = image_output_dir
+        self.hardlinks = hardlinks
+        os.makedirs(image_output_dir, exist_ok=True)
+
+        self.source_hash = HashCache()
+
+        self.counts = {'reflinked': 0, 'hardlinked': 0, 'copied': 0, 'existing': 0}
+
+    def add(self, source):
+        """
+        Store source if its contents aren't already present and return the
+        filename it is stored under.
+        """
+        _, extension = os.path.splitext(source)
+        filename = self.source_hash(source)[:HASH_LENGTH] + extension.lower()
+        destination = os.path.join(self.image_output_dir, filename)
+
+        # The name is the content hash, so a file of the same size is the
+        # same file
+        if os.path.exists(destination) and os.path.getsize(destination) == os.path.getsize(source):
+            self.counts['existing'] += 1
+            return filename
+
+        self._place(source, destination)
+        return filename
+
+    def _place(self, source, destination):
+        temp_destination = destination + '.tmp'
+        if os.path.exists(temp_destination):
+            os.remove(temp_destination)
+
+        try:
+            reflink(source, temp_destination)
+            method = 'reflinked'
+        except OSError:
+            try:
+                if not self.hardlinks:
+                    raise OSError(errno.EPERM, 'hardlinks disabled')
+                os.link(source, temp_destination)
+                method = 'hardlinked'
+            except OSError:
+                shutil.copy2(source, temp_destination)
+                method = 'copied'
+
+        os.replace(temp_destination, destination)
+        self.counts[method] += 1
+        print(f"Stored {source} as {destination} ({method})")
+
+    def summary(self):
+        return ', '.join(f"{count} {method}" for method, count in self.counts.items())
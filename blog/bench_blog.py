@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+'''
+Benchmark the blog tools end to end on a synthetic Jekyll corpus.
+
+Generates posts with a mix of front matter shapes (block and inline
+categories, tags lists, tags: [], missing date), image links with spaces
+and an Obsidian vault with embeds, then times add_date_to_frontmatter,
+convert_categories_to_tags, encode_image_urls, the combined pipeline and
+process_markdown_file. Each benchmark runs in a fresh process on a fresh
+copy of the corpus so the files/sec and peak RSS numbers are independent.
+
+Example usage:
+bench_blog.py --posts 20000 --jobs 8
+'''
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import resource
+import contextlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+blog_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename):
+    """Import one of the hyphenated blog scripts as a module."""
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(blog_dir, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_frontmatter(rng, i):
+    lines = [f'title: "Synthetic post {i}"', 'layout: post']
+
+    shape = rng.randrange(5)
+    categories = [f'category{rng.randrange(50)}' for _ in range(rng.randrange(1, 4))]
+    tags = [f'tag{rng.randrange(500)}' for _ in range(rng.randrange(0, 6))]
+
+    if shape == 0:
+        lines.append('categories:')
+        lines += [f'- {category}' for category in categories]
+        lines.append('tags: []')
+    elif shape == 1:
+        lines.append('categories:')
+        lines += [f'- {category}' for category in categories]
+        lines.append('tags:')
+        lines += [f'- {tag}' for tag in tags]
+    elif shape == 2:
+        lines.append(f'categories: [{", ".join(categories)}]')
+    elif shape == 3:
+        lines.append('tags:')
+        lines += [f'- {tag}' for tag in tags]
+    else:
+        lines.append(f'date: 2020-01-{i % 28 + 1:02d}')
+
+    return '---\n' + '\n'.join(lines) + '\n---\n'
+
+
+def make_body(rng, i, paragraphs):
+    body = []
+    for p in range(paragraphs):
+        body.append(f"Paragraph {p} of post {i}. " + "Some filler text for the post body. " * rng.randrange(2, 10))
+        choice = rng.randrange(4)
+        if choice == 0:
+            body.append(f"![Figure {p}](/images/post {i}/figure {p}.png)")
+        elif choice == 1:
+            body.append(f"![Figure {p}](/images/post-{i}-figure-{p}.png)")
+    return '\n\n'.join(body) + '\n'
+
+
+def generate_corpus(directory, posts, paragraphs=10, notes=None, seed=0):
+    """
+    Write a synthetic Jekyll corpus to directory/_posts and an Obsidian
+    vault to directory/vault.
+    """
+    rng = random.Random(seed)
+
+    posts_dir = os.path.join(directory, '_posts')
+    os.makedirs(posts_dir)
+    for i in range(posts):
+        day = f'20{rng.randrange(10, 25)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}'
+        with open(os.path.join(posts_dir, f'{day}-post-{i}.md'), 'w', encoding='utf-8') as f:
+            f.write(make_frontmatter(rng, i) + make_body(rng, i, paragraphs))
+
+    vault_dir = os.path.join(directory, 'vault')
+    attachments_dir = os.path.join(vault_dir, 'attachments')
+    os.makedirs(attachments_dir)
+    attachments = [f'Pasted image {20250223134448 + a}.png' for a in range(50)]
+    for a, attachment in enumerate(attachments):
+        with open(os.path.join(attachments_dir, attachment), 'wb') as f:
+            f.write(rng.randbytes(16 * 1024 + a))
+
+    for i in range(notes if notes is not None else max(1, posts // 10)):
+        embeds = [f"![[{rng.choice(attachments)}|Figure {e}]]" for e in range(rng.randrange(1, 10))]
+        with open(os.path.join(vault_dir, f'Note {i}.md'), 'w', encoding='utf-8') as f:
+            f.write(make_body(rng, i, paragraphs) + '\n\n'.join(embeds) + '\n')
+
+    return posts_dir, vault_dir
+
+
+def run_benchmark(name, corpus_dir, jobs):
+    """Run one benchmark on a private copy of the corpus. Runs in a child process."""
+    work_dir = corpus_dir + f'-{name}'
+    shutil.copytree(corpus_dir, work_dir)
+    posts_dir = os.path.join(work_dir, '_posts')
+    vault_dir = os.path.join(work_dir, 'vault')
+
+    sys.path.insert(0, blog_dir)
+    add_date = load_script('add-date.py')
+    categories_to_tags = load_script('categories-to-tags.py')
+    fix_urls = load_script('fix-urls.py')
+    obsidian_to_ghpages = load_script('obsidian-to-ghpages.py')
+    import pipeline
+
+    def export_notes():
+        output_dir = os.path.join(work_dir, 'output')
+        for note in obsidian_to_ghpages.find_notes(vault_dir):
+            obsidian_to_ghpages.process_markdown_file(note, output_dir, os.path.join(output_dir, 'images'))
+
+    benchmarks = {
+        'add-date': lambda: add_date.add_date_to_frontmatter(posts_dir, jobs),
+        'categories-to-tags': lambda: categories_to_tags.convert_categories_to_tags(posts_dir, jobs),
+        'fix-urls': lambda: fix_urls.encode_image_urls(posts_dir, jobs),
+        'pipeline': lambda: pipeline.run_pipeline(posts_dir, list(pipeline.STAGES), jobs),
+        'obsidian-to-ghpages': export_notes,
+    }
+
+    if name == 'obsidian-to-ghpages':
+        files = len(obsidian_to_ghpages.find_notes(vault_dir))
+    else:
+        files = len(os.listdir(posts_dir))
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        benchmarks[name]()
+        elapsed = time.perf_counter() - start
+
+    shutil.rmtree(work_dir)
+
+    # Largest of this process and any --jobs workers. ru_maxrss is in KB on
+    # Linux and bytes on macOS
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    return files, elapsed, peak_rss
+
+
+BENCHMARKS = ['add-date', 'categories-to-tags', 'fix-urls', 'pipeline', 'obsidian-to-ghpages']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the blog tools on a synthetic corpus.")
+    parser.add_argument("--posts", type=int, default=2000, help="Number of posts to generate")
+    parser.add_argument("--notes", type=int, default=None, help="Number of Obsidian notes (default: posts / 10)")
+    parser.add_argument("--paragraphs", type=int, default=10, help="Paragraphs per post")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for the blog transforms")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the corpus")
+    parser.add_argument("--only", nargs='+', choices=BENCHMARKS, default=BENCHMARKS,
+                        help="Benchmarks to run")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_blog_') as temp_dir:
+        corpus_dir = os.path.join(temp_dir, 'corpus')
+        start = time.perf_counter()
+        generate_corpus(corpus_dir, args.posts, args.paragraphs, args.notes, args.seed)
+        print(f"Generated corpus in {time.perf_counter() - start:.1f} s")
+
+        print(f"{'benchmark':22s} {'files':>8s} {'seconds':>9s} {'files/s':>10s} {'peak RSS':>10s}")
+        context = multiprocessing.get_context('spawn')
+        for name in args.only:
+            # A fresh process per benchmark so peak RSS isn't shared
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                files, elapsed, peak_rss = executor.submit(run_benchmark, name, corpus_dir, args.jobs).result()
+            print(f"{name:22s} {files:8d} {elapsed:9.2f} {files / elapsed:10.1f} {peak_rss / 1024:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+'''
+Microbenchmark for front_matter: parse + serialize throughput on large
+posts.
+
+Example usage:
+bench_front_matter.py --posts 200 --tags 500 --body-kb 256
+'''
+import time
+import argparse
+from front_matter import Document
+
+
+def make_post(num_tags, body_kb):
+    lines = ['---', 'title: "Benchmark post: large"', 'layout: post', 'categories:']
+    lines += [f'- category{i}' for i in range(num_tags // 10)]
+    lines.append('tags:')
+    lines += [f'- tag{i}' for i in range(num_tags)]
+    lines.append(f'aliases: [{", ".join(f"alias{i}" for i in range(num_tags // 10))}]')
+    lines.append('---')
+
+    paragraph = 'Lorem ipsum dolor sit amet ![img](/images/a b.png) consectetur. ' * 16 + '\n\n'
+    body = paragraph * max(1, (body_kb * 1024) // len(paragraph))
+    return '\n'.join(lines) + '\n' + body
+
+
+def bench(name, posts, fn):
+    total_bytes = sum(len(post) for post in posts)
+    start = time.perf_counter()
+    for post in posts:
+        fn(post)
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:28s} {len(posts) / elapsed:10.1f} posts/s {total_bytes / elapsed / 1e6:10.1f} MB/s")
+
+
+def round_trip(content):
+    return Document(content).to_string()
+
+
+def edit(content):
+    document = Document(content)
+    frontmatter = document.frontmatter
+    frontmatter.insert(frontmatter.index('title') + 1, 'date', '2024-01-01')
+    frontmatter.set('tags', frontmatter.get('categories') + frontmatter.get('tags'))
+    frontmatter.remove('categories')
+    return document.to_string()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark front matter parse and serialize.")
+    parser.add_argument("--posts", type=int, default=200, help="Number of posts")
+    parser.add_argument("--tags", type=int, default=500, help="Tags per post")
+    parser.add_argument("--body-kb", type=int, default=256, help="Body size per post in KB")
+
+    args = parser.parse_args()
+
+    posts = [make_post(args.tags, args.body_kb) for _ in range(args.posts)]
+
+    # Unchanged posts must round trip byte for byte
+    assert round_trip(posts[0]) == posts[0]
+
+    bench("parse + serialize", posts, round_trip)
+    bench("parse + edit + serialize", posts, edit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+'''
+Benchmark image tag rewriting in obsidian-to-ghpages on a synthetic note
+with thousands of embeds. Compares the single re.sub pass against the old
+findall + str.replace loop, which rescans the whole note per image.
+
+Example usage:
+bench_obsidian_embeds.py --embeds 5000
+'''
+import os
+import re
+import time
+import argparse
+import importlib.util
+
+script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'obsidian-to-ghpages.py')
+spec = importlib.util.spec_from_file_location('obsidian_to_ghpages', script_path)
+obsidian_to_ghpages = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(obsidian_to_ghpages)
+
+
+def make_note(num_embeds):
+    paragraphs = []
+    for i in range(num_embeds):
+        paragraphs.append(f"Paragraph {i} with some text around the image. " * 4)
+        paragraphs.append(f"![[Pasted image {20250223134448 + i}.png|Figure {i}]]")
+    return '\n\n'.join(paragraphs)
+
+
+def rewrite_legacy(content):
+    """The findall + replace loop used before the single pass rewrite."""
+    for i, (image_filename, image_description) in enumerate(re.findall(r'!\[\[(.*?)\|(.*?)\]\]', content), 1):
+        relative_path = f"images/post_{i}.png"
+        replacement = obsidian_to_ghpages.image_include(relative_path, image_description.strip())
+        original_tag = f"![[{image_filename}|{image_description}]]"
+        content = content.replace(original_tag, replacement)
+    return content
+
+
+def rewrite_single_pass(content):
+    image_index = 0
+
+    def replace(image_filename, image_description, image_size):
+        nonlocal image_index
+        image_index += 1
+        relative_path = f"images/post_{image_index}.png"
+        return obsidian_to_ghpages.image_include(relative_path, image_description, image_size)
+
+    return obsidian_to_ghpages.rewrite_image_tags(content, replace)
+
+
+def bench(name, fn, content):
+    start = time.perf_counter()
+    result = fn(content)
+    elapsed = time.perf_counter() - start
+    print(f"{name:12s} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Obsidian image tag rewriting.")
+    parser.add_argument("--embeds", type=int, default=5000, help="Number of image embeds in the note")
+
+    args = parser.parse_args()
+
+    content = make_note(args.embeds)
+    print(f"Note: {len(content) / 1e6:.1f} MB, {args.embeds} embeds")
+
+    legacy, legacy_time = bench("legacy", rewrite_legacy, content)
+    single, single_time = bench("single pass", rewrite_single_pass, content)
+
+    # Both must produce the same output
+    assert legacy == single
+    print(f"Speedup: {legacy_time / single_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,55 @@
 #!/usr/bin/env python3
 import os
-import re
 import sys
 import argparse
-import urllib.parse
-from pathlib import Path
+from pipeline import run_pipeline
+from image_links import validate_posts
 
-def encode_image_urls(directory_path):
+def encode_image_urls(directory_path, jobs=1, use_manifest=False):
     """
     Process all markdown files in the given directory to URL encode spaces
     in image URLs.
     """
+    return run_pipeline(directory_path, ['fix-urls'], jobs, use_manifest)
+
+def validate_image_urls(directory_path, site_root=None, image_dirs=('images', 'assets')):
+    """
+    Check every image URL in the posts against the files in the site's
+    image directories. Problems are written to stdout as JSON Lines and a
+    summary to stderr. Returns True if every image was found.
+    """
     # Ensure the directory exists
     if not os.path.isdir(directory_path):
-        print(f"Error: Directory '{directory_path}' does not exist.")
+        print(f"Error: Directory '{directory_path}' does not exist.", file=sys.stderr)
         return False
     
-    # Find all markdown files in the directory
-    md_files = list(Path(directory_path).glob('*.md'))
-    print(f"Found {len(md_files)} markdown files.")
-    
-    # Counter for modified files
-    modified_count = 0
-    total_replacements = 0
-    
-    # Regular expression to match markdown image syntax
-    # Captures: ![alt text](/path/with spaces/image.jpg)
-    image_pattern = r'!\[(.*?)\]\((.*?)\)'
-    
-    # Process each markdown file
-    for md_file in md_files:
-        filename = md_file.name
-        file_replacements = 0
-        
-        # Read file content
-        with open(md_file, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Find all image tags
-        def encode_url(match):
-            nonlocal file_replacements
-            alt_text = match.group(1)
-            url = match.group(2)
-            
-            # Check if URL contains spaces
-            if ' ' in url:
-                # Split the URL to preserve any potential query parameters or fragment identifiers
-                url_parts = url.split('?', 1)
-                path = url_parts[0]
-                query = f"?{url_parts[1]}" if len(url_parts) > 1 else ""
-                
-                # Encode spaces in the path part
-                encoded_path = path.replace(' ', '%20')
-                encoded_url = encoded_path + query
-                
-                file_replacements += 1
-                return f'![{alt_text}]({encoded_url})'
-            else:
-                return match.group(0)
-        
-        # Replace image URLs with encoded versions
-        new_content = re.sub(image_pattern, encode_url, content)
-        
-        # If changes were made, write back to file
-        if file_replacements > 0:
-            with open(md_file, 'w', encoding='utf-8') as file:
-                file.write(new_content)
-            
-            print(f"Updated {filename}: Encoded {file_replacements} image URLs")
-            modified_count += 1
-            total_replacements += file_replacements
-        else:
-            print(f"Skipping {filename}: No image URLs with spaces found.")
+    # Posts usually live in <site>/_posts
+    if site_root is None:
+        site_root = os.path.dirname(os.path.abspath(directory_path))
     
-    print(f"\nOperation complete: {modified_count} files were modified with {total_replacements} total URL encodings.")
-    return True
+    problems, indexed = validate_posts(directory_path, site_root, image_dirs, sys.stdout)
+    print(f"Checked image links against {indexed} files: {problems} problems found.", file=sys.stderr)
+    return problems == 0
 
 def main():
     parser = argparse.ArgumentParser(description="URL encode spaces in markdown image URLs.")
     parser.add_argument("directory", help="Directory containing markdown files to process")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--manifest", action="store_true",
+                        help="Skip posts unchanged since the last run (uses .blog-manifest.json)")
+    parser.add_argument("--validate", action="store_true",
+                        help="Don't modify anything, report missing or mis-cased image targets as JSON Lines")
+    parser.add_argument("--site-root", help="Site root for --validate (default: parent of directory)")
+    parser.add_argument("--image-dir", dest="image_dirs", action="append",
+                        help="Image directory relative to the site root, may be repeated (default: images, assets)")
     
     args = parser.parse_args()
     
-    if not encode_image_urls(args.directory):
+    if args.validate:
+        if not validate_image_urls(args.directory, args.site_root, args.image_dirs or ('images', 'assets')):
+            sys.exit(1)
+    elif not encode_image_urls(args.directory, args.jobs, args.manifest):
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,214 @@
+'''
+Front matter parser and serializer shared by the blog scripts.
+
+A post is split once into the YAML front matter and the rest of the file.
+The front matter is parsed into an ordered list of entries (scalars, block
+lists and inline [] arrays). Entries that are not changed are written back
+exactly as they were read, so serializing only touches the lines that a
+transform actually modified.
+
+Only the flat subset of YAML used by Jekyll posts is understood. Anything
+else (nested mappings, multi-line strings, comments) is kept verbatim.
+'''
+import re
+
+frontmatter_re = re.compile(r'^(---\s+)(.*?)(\s+---)', re.DOTALL)
+key_re = re.compile(r'^([^\s#\-][^:]*):(?:[ \t]+(.*?))?[ \t]*$')
+list_item_re = re.compile(r'^(\s*)- (.*)$')
+date_re = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def unquote(value):
+    """Strip one level of matching quotes from a scalar or list item."""
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+
+def date_value(value):
+    """The YYYY-MM-DD date a date scalar starts with, quoted or not, or None."""
+    if not isinstance(value, str):
+        return None
+    match = date_re.match(unquote(value.strip()))
+    return match.group(0) if match else None
+
+
+def parse_inline_list(value):
+    """Parse an inline array like [a, b, "c"] into its raw items."""
+    inner = value[1:-1].strip()
+    if not inner:
+        return []
+    return [item.strip() for item in inner.split(',')]
+
+
+class Entry(object):
+    '''
+    One top-level key with its value, or a run of lines that don't belong
+    to any key (key is None).
+    '''
+    def __init__(self, key, lines, rest=''):
+        self.key = key
+        self.lines = lines
+        self.value = None
+        self.inline = False
+        self.indent = ''
+        self.dirty = False
+
+        # Blank lines at the end of an entry are kept when it is rewritten
+        self.trailing = 0
+        while len(self.lines) > 1 and not self.lines[-1].strip():
+            self.lines.pop()
+            self.trailing += 1
+
+        if key is not None:
+            self._parse_value(rest or '')
+
+    def _parse_value(self, rest):
+        continuation = self.lines[1:]
+
+        if rest:
+            if rest.startswith('[') and rest.endswith(']'):
+                self.value = parse_inline_list(rest)
+                self.inline = True
+            elif not continuation:
+                self.value = rest
+            return
+
+        # Block list: every non-blank continuation line must be an item,
+        # anything else is a structure this module doesn't handle
+        items = []
+        for line in continuation:
+            if not line.strip():
+                continue
+            m = list_item_re.match(line)
+            if not m:
+                return
+            if not items:
+                self.indent = m.group(1)
+            items.append(m.group(2).strip())
+
+        if items:
+            self.value = items
+
+    def serialize(self):
+        if not self.dirty:
+            lines = self.lines
+        elif isinstance(self.value, list):
+            if not self.value:
+                lines = [f'{self.key}: []']
+            elif self.inline:
+                lines = [f'{self.key}: [{", ".join(self.value)}]']
+            else:
+                lines = [f'{self.key}:'] + [f'{self.indent}- {item}' for item in self.value]
+        elif self.value:
+            lines = [f'{self.key}: {self.value}']
+        else:
+            lines = [f'{self.key}:']
+
+        return lines + [''] * self.trailing
+
+
+class FrontMatter(object):
+    ''' Ordered front matter entries, serialized back with minimal diff '''
+    def __init__(self, text):
+        self.text = text
+        self.changed = False
+        self.entries = []
+
+        # Group lines under the key that starts them
+        groups = []
+        current = None
+        for line in text.split('\n'):
+            m = key_re.match(line)
+            if m or current is None:
+                current = [line]
+                groups.append((m, current))
+            else:
+                current.append(line)
+
+        for m, lines in groups:
+            if m:
+                self.entries.append(Entry(m.group(1).strip(), lines, m.group(2)))
+            else:
+                self.entries.append(Entry(None, lines))
+
+    def index(self, key):
+        for i, entry in enumerate(self.entries):
+            if entry.key == key:
+                return i
+        return -1
+
+    def __contains__(self, key):
+        return self.index(key) >= 0
+
+    def keys(self):
+        return [entry.key for entry in self.entries if entry.key is not None]
+
+    def get(self, key, default=None):
+        i = self.index(key)
+        if i < 0:
+            return default
+        return self.entries[i].value
+
+    def set(self, key, value):
+        """Replace the value of key, adding it at the end if it is new."""
+        i = self.index(key)
+        if i < 0:
+            self.insert(len(self.entries), key, value)
+            return
+
+        entry = self.entries[i]
+        # An empty [] expands to a block list once it has items
+        if entry.inline and not entry.value:
+            entry.inline = False
+        entry.value = value
+        entry.dirty = True
+        self.changed = True
+
+    def insert(self, index, key, value):
+        """Insert a new key before the entry at index."""
+        entry = Entry(key, [f'{key}:'])
+        entry.value = value
+        entry.dirty = True
+        self.entries.insert(index, entry)
+        self.changed = True
+
+    def remove(self, key):
+        i = self.index(key)
+        if i >= 0:
+            del self.entries[i]
+            self.changed = True
+
+    def serialize(self):
+        if not self.changed:
+            return self.text
+
+        lines = []
+        for entry in self.entries:
+            lines.extend(entry.serialize())
+        return '\n'.join(lines)
+
+
+class Document(object):
+    '''
+    A post split into opening delimiter, front matter, closing delimiter
+    and body. Posts without front matter have frontmatter set to None and
+    everything in body.
+    '''
+    def __init__(self, content):
+        m = frontmatter_re.match(content)
+        if m:
+            self.opening = m.group(1)
+            self.frontmatter = FrontMatter(m.group(2))
+            self.closing = m.group(3)
+            self.body = content[m.end():]
+        else:
+            self.opening = ''
+            self.frontmatter = None
+            self.closing = ''
+            self.body = content
+
+    def to_string(self):
+        if self.frontmatter is None:
+            return self.body
+        return self.opening + self.frontmatter.serialize() + self.closing + self.body
@@ -0,0 +1,108 @@
+'''
+Validate image links in posts against the files that actually exist in the
+site's image directories.
+
+The image directories are walked once to build an in-memory index, so
+checking a link is a set lookup rather than a stat() call. URLs are decoded
+before lookup (so "a%20b.png" and "a b.png" both find "a b.png") and
+suggestions are encoded the same way fix-urls encodes them.
+'''
+import os
+import re
+import json
+import urllib.parse
+from pathlib import Path
+
+image_re = re.compile(r'!\[(.*?)\]\((.*?)\)')
+liquid_prefix_re = re.compile(r'^\{\{[^}]*\}\}')
+
+
+def encode_url_path(path):
+    """Encode a path the way fix-urls does: only spaces."""
+    return path.replace(' ', '%20')
+
+
+class ImageIndex(object):
+    def __init__(self, site_root, image_dirs):
+        self.site_root = site_root
+        # Site-relative paths like /images/foo.png
+        self.paths = set()
+        # Lower-cased path -> actual paths, for case mismatch suggestions
+        self.lowered = {}
+
+        for image_dir in image_dirs:
+            top = os.path.join(site_root, image_dir)
+            for root, _, files in os.walk(top):
+                relative_root = os.path.relpath(root, site_root).replace(os.sep, '/')
+                for filename in files:
+                    path = f'/{relative_root}/{filename}'
+                    self.paths.add(path)
+                    self.lowered.setdefault(path.lower(), []).append(path)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def check(self, url):
+        """
+        Return None if url points at an indexed file or isn't a local image
+        link, otherwise (problem, suggested url or None).
+        """
+        url = liquid_prefix_re.sub('', url.strip())
+
+        # Drop an optional title: ![alt](/img.png "Title")
+        url = url.split(' "', 1)[0]
+
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme or parsed.netloc or not parsed.path:
+            return None
+
+        path = urllib.parse.unquote(parsed.path)
+        if not path.startswith('/'):
+            path = '/' + path
+
+        if path in self.paths:
+            return None
+
+        matches = self.lowered.get(path.lower())
+        if matches:
+            return 'case-mismatch', encode_url_path(matches[0])
+
+        return 'missing', None
+
+
+def validate_posts(directory_path, site_root, image_dirs, output):
+    """
+    Check every image URL in every post and write one JSON object per
+    problem to output. Returns (number of problems found, number of
+    image files indexed).
+    """
+    index = ImageIndex(site_root, image_dirs)
+
+    problems = 0
+    for md_file in sorted(Path(directory_path).glob('*.md')):
+        with open(md_file, 'r', encoding='utf-8') as file:
+            content = file.read()
+
+        line = 1
+        position = 0
+        for match in image_re.finditer(content):
+            result = index.check(match.group(2))
+            if result is None:
+                continue
+
+            line += content.count('\n', position, match.start())
+            position = match.start()
+
+            problem, suggestion = result
+            record = {
+                'post': str(md_file),
+                'line': line,
+                'url': match.group(2),
+                'problem': problem,
+            }
+            if suggestion:
+                record['suggestion'] = suggestion
+            output.write(json.dumps(record) + '\n')
+            problems += 1
+
+    return problems, len(index)
@@ -0,0 +1,179 @@
+'''
+Optional image optimization for exported Obsidian attachments.
+
+Pasted screenshots are usually multi-megabyte PNGs. This resizes them to a
+maximum width and re-encodes them (WebP, JPEG or PNG) with Pillow, spread
+over a process pool. Output files are named after the source hash and the
+settings, so an image that was already optimized with the same settings is
+never encoded again. Nothing is written under that name unless encoding
+succeeds, so an image that fails is tried again on the next run.
+'''
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from attachment_store import HashCache
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+}
+
+# Extensions Pillow can re-encode; anything else is exported untouched
+OPTIMIZABLE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp'}
+
+
+def optimize_image(source, destination, max_width, image_format, quality):
+    """Resize and re-encode one image. Runs in a worker process."""
+    pil_format, _ = FORMATS[image_format]
+
+    with Image.open(source) as image:
+        image.load()
+
+        if max_width and image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            # JPEG has no alpha channel, flatten onto white
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+
+        options = {'optimize': True}
+        if pil_format == 'WEBP':
+            options = {'quality': quality, 'method': 6}
+        elif pil_format == 'JPEG':
+            options['quality'] = quality
+            options['progressive'] = True
+
+        temp_destination = destination + '.tmp'
+        try:
+            image.save(temp_destination, pil_format, **options)
+        except Exception:
+            if os.path.exists(temp_destination):
+                os.remove(temp_destination)
+            raise
+
+    os.replace(temp_destination, destination)
+    return source, destination
+
+
+class ImageOptimizer(object):
+    def __init__(self, image_output_dir, max_width=1600, image_format='webp', quality=80, jobs=None):
+        if Image is None:
+            raise ImportError("Pillow is required for image optimization. Install it using: pip install Pillow")
+
+        self.image_output_dir = image_output_dir
+        self.max_width = max_width
+        self.image_format = image_format
+        self.quality = quality
+        self.jobs = jobs
+        os.makedirs(image_output_dir, exist_ok=True)
+
+        settings = f'{max_width}:{image_format}:{quality}'
+        self.settings_hash = hashlib.sha256(settings.encode()).hexdigest()[:8]
+
+        self.source_hash = HashCache()
+        # (path, size, mtime) -> whether Pillow can read the file, set to
+        # False when encoding fails so the image is exported unchanged
+        self.readable = {}
+        # destination -> source, for images that still need encoding
+        self.pending = {}
+        # Destinations known to hold encoded output
+        self.encoded = set()
+        self.counts = {'optimized': 0, 'cached': 0, 'failed': 0}
+
+    def _key(self, source):
+        stat = os.stat(source)
+        return (os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+
+    def can_optimize(self, source):
+        """
+        Whether source is an image Pillow can re-encode. Broken files are
+        caught here with a cheap verify() so they're exported as they are
+        without a trip through the process pool.
+        """
+        if os.path.splitext(source)[1].lower() not in OPTIMIZABLE_EXTENSIONS:
+            return False
+
+        key = self._key(source)
+        if key not in self.readable:
+            try:
+                with Image.open(source) as image:
+                    image.verify()
+                self.readable[key] = True
+            except Exception as e:
+                print(f"Warning: Not optimizing unreadable image {source}: {e}")
+                self.readable[key] = False
+        return self.readable[key]
+
+    def _filename(self, source):
+        _, extension = FORMATS[self.image_format]
+        return f'{self.source_hash(source)[:16]}-{self.settings_hash}{extension}'
+
+    def add(self, source):
+        """
+        Queue source for encoding unless it is already in the output
+        directory. Call run() to encode the queue.
+        """
+        destination = os.path.join(self.image_output_dir, self._filename(source))
+        if destination in self.encoded or destination in self.pending:
+            return
+
+        if os.path.exists(destination):
+            self.encoded.add(destination)
+            self.counts['cached'] += 1
+        else:
+            self.pending[destination] = source
+
+    def optimized(self, source):
+        """
+        The filename of the optimized image of source, or None if it hasn't
+        been encoded (not queued yet, not run yet, or it failed).
+        """
+        if not self.can_optimize(source):
+            return None
+        filename = self._filename(source)
+        if os.path.join(self.image_output_dir, filename) not in self.encoded:
+            return None
+        return filename
+
+    def run(self):
+        """Encode every queued image across a process pool."""
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, {}
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {
+                executor.submit(optimize_image, source, destination,
+                                self.max_width, self.image_format, self.quality): (source, destination)
+                for destination, source in pending.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    source, destination = future.result()
+                except Exception as e:
+                    source, _ = futures[future]
+                    self.readable[self._key(source)] = False
+                    print(f"Error optimizing {source}, exporting it unchanged: {e}")
+                    self.counts['failed'] += 1
+                    continue
+                self.encoded.add(destination)
+                before = os.path.getsize(source)
+                after = os.path.getsize(destination)
+                print(f"Optimized {source} to {destination} ({before // 1024} KB -> {after // 1024} KB)")
+                self.counts['optimized'] += 1
+
+    def summary(self):
+        return ', '.join(f"{count} {state}" for state, count in self.counts.items())
@@ -0,0 +1,116 @@
+'''
+Manifest of processed posts, used by the blog transforms to skip files that
+have not changed since they were last processed.
+
+Each entry records the file's size, mtime, content hash and the stages that
+have already been applied to that content. The manifest lives next to the
+posts as .blog-manifest.json; if it is missing or unreadable every file is
+processed again.
+'''
+import os
+import json
+import hashlib
+
+MANIFEST_FILENAME = '.blog-manifest.json'
+MANIFEST_VERSION = 1
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class Manifest(object):
+    def __init__(self, directory_path):
+        self.path = os.path.join(directory_path, MANIFEST_FILENAME)
+        self.files = {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == MANIFEST_VERSION:
+                self.files = data['files']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, AttributeError):
+            print(f"Warning: Ignoring unreadable manifest {self.path}")
+
+        # Content hash to entry, so renamed files are still recognised
+        self.by_hash = {entry['sha256']: entry for entry in self.files.values()}
+        # Sizes of the known contents, so a file that can't match any of
+        # them isn't read and hashed here only to be read again later
+        self.sizes = {entry['size'] for entry in self.files.values()}
+
+    def is_current(self, md_file, stages):
+        """
+        Return True if every stage has already been applied to the current
+        contents of md_file.
+        """
+        stage_names = {stage.name for stage in stages}
+        stat = md_file.stat()
+
+        # Fast path: same file, untouched since it was recorded
+        entry = self.files.get(md_file.name)
+        if (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                and stage_names <= set(entry['stages'])):
+            return True
+
+        # Identical content has the same size, no candidate means no match
+        if any(stage.uses_filename for stage in stages):
+            if not entry or entry['size'] != stat.st_size:
+                return False
+        elif stat.st_size not in self.sizes:
+            return False
+
+        with open(md_file, 'rb') as file:
+            sha256 = hash_bytes(file.read())
+
+        # Otherwise look the content up by hash, which also recognises
+        # renamed files. Stages that read the filename can't be trusted
+        # across a rename, so those only match the entry for this name.
+        if any(stage.uses_filename for stage in stages):
+            known = entry if entry and entry['sha256'] == sha256 else None
+        else:
+            known = self.by_hash.get(sha256)
+
+        if known is not None and stage_names <= set(known['stages']):
+            # Only carry over the other recorded stages if this is the
+            # same file; after a rename just the requested ones are known.
+            self.record(md_file, sha256, known['stages'] if known is entry else stage_names)
+            return True
+
+        return False
+
+    def previous_stages(self, md_file, sha256):
+        """
+        Stages already applied to this exact content, if it is known.
+        """
+        entry = self.files.get(md_file.name)
+        if entry is None or entry['sha256'] != sha256:
+            return []
+        return entry['stages']
+
+    def record(self, md_file, sha256, stages):
+        stat = md_file.stat()
+        entry = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'stages': sorted(stages),
+        }
+        self.files[md_file.name] = entry
+        self.by_hash[sha256] = entry
+        self.sizes.add(entry['size'])
+
+    def prune(self, md_files):
+        """
+        Drop entries for posts that no longer exist.
+        """
+        names = {md_file.name for md_file in md_files}
+        self.files = {name: entry for name, entry in self.files.items() if name in names}
+
+    def save(self):
+        data = {'version': MANIFEST_VERSION, 'files': self.files}
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
@@ -2,11 +2,113 @@
 import os
 import re
 import argparse
+import json
 import shutil
 import datetime
 from pathlib import Path
+from front_matter import Document, date_value
+from attachment_store import AttachmentStore
+from vault_watcher import VaultWatcher
+from image_optimizer import ImageOptimizer, FORMATS
 
-def process_markdown_file(input_file, output_dir, image_output_dir):
+# Remembers the date each note was first exported, keyed by note path
+EXPORT_DATES_FILENAME = '.export-dates.json'
+
+# Obsidian image embeds, with optional description and size suffix:
+# ![[Pasted image 20250223134448.png]]
+# ![[Pasted image 20250223134448.png|Figure 2-2 from USB-C Spec - Plug Interface]]
+# ![[Pasted image 20250223134448.png|Figure 2-2 from USB-C Spec - Plug Interface|300]]
+# ![[Pasted image 20250223134448.png|640x480]]
+image_tag_re = re.compile(r'!\[\[\s*([^\]|]+?)\s*(?:\|([^\]]*))?\]\]')
+image_size_re = re.compile(r'^\s*\d+(x\d+)?\s*$')
+
+def rewrite_image_tags(text, replace):
+    """
+    Rewrite every image embed in text in a single pass. replace is called
+    as replace(filename, description, size) for each embed, in order, and
+    returns the new tag or None to leave the embed unchanged.
+    """
+    def replace_match(match):
+        image_filename = match.group(1)
+        description_parts = []
+        image_size = None
+        
+        # Anything after the filename is a description, a size, or both
+        if match.group(2) is not None:
+            for part in match.group(2).split('|'):
+                if image_size is None and image_size_re.match(part):
+                    image_size = part.strip()
+                else:
+                    description_parts.append(part)
+        
+        replacement = replace(image_filename, '|'.join(description_parts).strip(), image_size)
+        return match.group(0) if replacement is None else replacement
+    
+    return image_tag_re.sub(replace_match, text)
+
+def image_include(relative_path, image_description, image_size=None):
+    """
+    Jekyll include tag for an exported image.
+    """
+    width = ''
+    if image_size:
+        width = f'    width="{image_size.split("x")[0]}"\n'
+    
+    return f"""
+{{% include image.html 
+    img="{relative_path}" 
+    title="{image_description}"
+    caption="{image_description}"
+    url="/{relative_path}"
+{width}%}}
+"""
+
+def load_export_dates(output_dir):
+    try:
+        with open(os.path.join(output_dir, EXPORT_DATES_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_export_dates(output_dir, export_dates):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, EXPORT_DATES_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(export_dates, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def note_date(input_file, document, export_dates):
+    """
+    Stable date prefix for a note: the date in its front matter if it has
+    one, otherwise the date it was first exported.
+    """
+    if document.frontmatter is not None:
+        date = date_value(document.frontmatter.get('date'))
+        if date is not None:
+            return date
+    
+    key = os.path.abspath(input_file)
+    if key not in export_dates:
+        export_dates[key] = datetime.datetime.now().strftime("%Y-%m-%d")
+    return export_dates[key]
+
+def find_attachments(input_file, content):
+    """
+    Paths of the attachments a note embeds.
+    """
+    attachments_dir = os.path.join(os.path.dirname(input_file), 'attachments')
+    return [os.path.join(attachments_dir, match.group(1)) for match in image_tag_re.finditer(content)]
+
+def queue_images(optimizer, attachments):
+    """
+    Queue the attachments the optimizer can handle for encoding.
+    """
+    for attachment in attachments:
+        if os.path.exists(attachment) and optimizer.can_optimize(attachment):
+            optimizer.add(attachment)
+
+def process_markdown_file(input_file, output_dir, image_output_dir, store=None, export_dates=None,
+                          optimizer=None):
     """
     Process a markdown file:
     - Extract title from filename
@@ -14,6 +116,13 @@ def process_markdown_file(input_file, output_dir, image_output_dir):
     - Copy and rename image files
     - Replace image tags with new format
     - Save the new markdown file
+
+    If an AttachmentStore is given, images are stored once under their
+    content hash instead of being copied as {post_title}_{i}. If
+    export_dates is given, the output filename keeps the same date prefix
+    across runs instead of using today's date. If an ImageOptimizer is
+    given, the note's images are encoded first and the ones that made it
+    point at the optimized file instead.
     """
     # Get post title from filename
     base_filename = os.path.basename(input_file)
@@ -25,82 +134,182 @@ def process_markdown_file(input_file, output_dir, image_output_dir):
     
     # Load the markdown content
     with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+        document = Document(f.read())
     
     # Find the attachments directory (in the same path as the input file)
     input_file_dir = os.path.dirname(input_file)
     attachments_dir = os.path.join(input_file_dir, 'attachments')
     
-    # Regular expression to match image tags
-    # Format: ![[Pasted image 20250223134448.png|Figure 2-2 from USB-C Spec - Plug Interface]]
-    image_pattern = r'!\[\[(.*?)\|(.*?)\]\]'
+    # Encode before any tag is written so no tag points at an image that
+    # failed to encode. Images already encoded, e.g. queued for the whole
+    # vault by export_vault, aren't encoded again
+    if optimizer is not None:
+        queue_images(optimizer, find_attachments(input_file, document.body))
+        optimizer.run()
     
-    # Find all image tags
-    image_matches = re.findall(image_pattern, content)
+    image_index = 0
     
-    # Process each image
-    for i, (image_filename, image_description) in enumerate(image_matches, 1):
+    def replace_image(image_filename, image_description, image_size):
+        nonlocal image_index
+        image_index += 1
+        
         # Original image path
-        original_image_path = os.path.join(attachments_dir, image_filename.strip())
+        original_image_path = os.path.join(attachments_dir, image_filename)
         
         # Check if the image file exists
         if not os.path.exists(original_image_path):
             print(f"Warning: Image file not found: {original_image_path}")
-            continue
+            return None
         
-        # Get file extension
-        _, extension = os.path.splitext(image_filename)
-        
-        # Create new image filename
-        new_image_filename = f"{post_title}_{i}{extension}"
-        new_image_path = os.path.join(image_output_dir, new_image_filename)
-        
-        # Copy and rename the image file
-        shutil.copy2(original_image_path, new_image_path)
-        print(f"Copied {original_image_path} to {new_image_path}")
+        if optimizer is not None and optimizer.optimized(original_image_path) is not None:
+            new_image_filename = optimizer.optimized(original_image_path)
+        elif store is not None:
+            new_image_filename = store.add(original_image_path)
+        else:
+            # Get file extension
+            _, extension = os.path.splitext(image_filename)
+            
+            # Create new image filename
+            new_image_filename = f"{post_title}_{image_index}{extension}"
+            new_image_path = os.path.join(image_output_dir, new_image_filename)
+            
+            # Copy and rename the image file
+            shutil.copy2(original_image_path, new_image_path)
+            print(f"Copied {original_image_path} to {new_image_path}")
         
         # Create the replacement image tag
         relative_path = os.path.join(os.path.basename(image_output_dir), new_image_filename)
-        replacement = f"""
-{{% include image.html 
-    img="{relative_path}" 
-    title="{image_description.strip()}"
-    caption="{image_description.strip()}"
-    url="/{relative_path}"
-%}}
-"""
-        
-        # Replace the original image tag with the new format
-        original_tag = f"![[{image_filename}|{image_description}]]"
-        content = content.replace(original_tag, replacement)
+        return image_include(relative_path, image_description, image_size)
+    
+    # Replace every image tag in one pass (only in the body, never in the front matter)
+    document.body = rewrite_image_tags(document.body, replace_image)
     
     # Create the new filename with date prefix
-    today = datetime.datetime.now().strftime("%Y-%m-%d")
-    new_filename = f"{today}-{base_filename}"
+    if export_dates is not None:
+        date = note_date(input_file, document, export_dates)
+    else:
+        date = datetime.datetime.now().strftime("%Y-%m-%d")
+    new_filename = f"{date}-{base_filename}"
     output_path = os.path.join(output_dir, new_filename)
     
     # Save the modified content to the output file
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+        f.write(document.to_string())
     
     print(f"Processed markdown file saved to: {output_path}")
     
     return output_path
 
+def find_notes(vault_dir):
+    """
+    Find all notes in a vault, skipping hidden directories like .obsidian
+    and .trash.
+    """
+    notes = []
+    for root, dirs, files in os.walk(vault_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        notes.extend(os.path.join(root, f) for f in sorted(files) if f.endswith('.md'))
+    return notes
+
+def export_vault(vault_dir, output_dir, image_output_dir, hardlinks=False, watch=False, debounce=0.3,
+                 optimizer=None):
+    """
+    Export every note in a vault, storing each distinct attachment once.
+    With watch, keep running and re-export notes as they change.
+    """
+    store = AttachmentStore(image_output_dir, hardlinks=hardlinks)
+    export_dates = load_export_dates(output_dir)
+    
+    # Output is named after the note's filename, so notes with the same
+    # name in different folders would overwrite each other. The first one
+    # keeps the name: filename -> note path
+    owners = {}
+    
+    def claim(note):
+        name = os.path.basename(note)
+        owner = owners.get(name)
+        if owner is not None and owner != note and os.path.exists(owner):
+            print(f"Error: Not exporting {note}, {owner} is already exported as {name}")
+            return False
+        owners[name] = note
+        return True
+    
+    def export_note(note):
+        if not claim(note):
+            return
+        process_markdown_file(note, output_dir, image_output_dir, store, export_dates, optimizer)
+        save_export_dates(output_dir, export_dates)
+    
+    notes = find_notes(vault_dir)
+    print(f"Found {len(notes)} notes in {vault_dir}")
+    
+    exported = [note for note in notes if claim(note)]
+    if optimizer is not None:
+        # Encode the images of the whole vault in one pool, not note by note
+        for note in exported:
+            with open(note, 'r', encoding='utf-8') as f:
+                queue_images(optimizer, find_attachments(note, f.read()))
+        optimizer.run()
+    for note in exported:
+        process_markdown_file(note, output_dir, image_output_dir, store, export_dates, optimizer)
+    save_export_dates(output_dir, export_dates)
+    
+    print(f"\nExported {len(exported)} notes. Attachments: {store.summary()}")
+    if len(exported) < len(notes):
+        print(f"Skipped {len(notes) - len(exported)} notes with duplicate names")
+    if optimizer is not None:
+        print(f"Images: {optimizer.summary()}")
+    
+    if watch:
+        VaultWatcher(vault_dir, export_note, find_attachments, debounce).run(notes)
+
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description="Process markdown files with embedded images")
-    parser.add_argument("input_file", help="Input markdown file path")
+    parser.add_argument("input_file", help="Input markdown file path, or a vault directory to export every note")
     parser.add_argument("output_dir", help="Output directory for processed markdown files")
     parser.add_argument("--image-dir", dest="image_output_dir", 
                         help="Output directory for processed images (default: images/)", 
                         default="images")
+    parser.add_argument("--hardlinks", action="store_true",
+                        help="When exporting a vault, hardlink attachments instead of copying them "
+                             "if reflinks aren't available. Only safe if attachments are never "
+                             "edited in place")
+    parser.add_argument("--watch", action="store_true",
+                        help="After exporting a vault, keep watching it and re-export changed notes")
+    parser.add_argument("--debounce", type=float, default=0.3,
+                        help="Seconds to wait for a burst of saves to settle in watch mode (default: 0.3)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Resize and re-encode images with Pillow")
+    parser.add_argument("--max-width", type=int, default=1600,
+                        help="Maximum width of optimized images in pixels (default: 1600)")
+    parser.add_argument("--format", dest="image_format", choices=list(FORMATS), default="webp",
+                        help="Format of optimized images (default: webp)")
+    parser.add_argument("--quality", type=int, default=80,
+                        help="Quality of optimized WebP/JPEG images (default: 80)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Number of worker processes for image optimization (default: one per CPU)")
     
     # Parse arguments
     args = parser.parse_args()
     
-    # Process the markdown file
-    process_markdown_file(args.input_file, args.output_dir, args.image_output_dir)
+    optimizer = None
+    if args.optimize:
+        try:
+            optimizer = ImageOptimizer(args.image_output_dir, args.max_width, args.image_format,
+                                       args.quality, args.jobs)
+        except ImportError as e:
+            parser.error(str(e))
+    
+    if os.path.isdir(args.input_file):
+        export_vault(args.input_file, args.output_dir, args.image_output_dir, args.hardlinks,
+                     args.watch, args.debounce, optimizer)
+    elif args.watch:
+        parser.error("--watch needs a vault directory")
+    else:
+        # Process the markdown file
+        process_markdown_file(args.input_file, args.output_dir, args.image_output_dir,
+                              optimizer=optimizer)
 
 if __name__ == "__main__":
     main()
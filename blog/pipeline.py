@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+'''
+Run several blog post transforms over a directory in a single pass.
+
+Each transform is registered as a stage. Stages run in the order given on
+the command line against one in-memory copy of each post, so every file is
+read once and written at most once.
+
+Example usage:
+pipeline.py _posts --stages add-date categories-to-tags fix-urls --jobs 8
+'''
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from front_matter import Document, date_value
+from manifest import Manifest, hash_bytes
+from tag_index import TagIndex
+
+
+class Post(object):
+    '''
+    In-memory copy of a markdown post shared by all stages. The front
+    matter is parsed on first use and reused by later stages until one of
+    them replaces the content wholesale.
+    '''
+    def __init__(self, path, content):
+        self.path = Path(path)
+        self.filename = self.path.name
+        self._content = content
+        self._document = None
+        self.counters = {}
+        # (date, tags) after categories-to-tags ran, for the tag index
+        self.taxonomy = None
+
+    @property
+    def document(self):
+        if self._document is None:
+            self._document = Document(self._content)
+        return self._document
+
+    @property
+    def content(self):
+        if self._document is not None:
+            return self._document.to_string()
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        self._content = content
+        self._document = None
+
+
+class Stage(object):
+    ''' A named transform applied to a Post '''
+    def __init__(self, name, apply, summary=None, uses_filename=False):
+        self.name = name
+        self.apply = apply
+        self.summary = summary
+        # Whether the result depends on the filename as well as the content
+        self.uses_filename = uses_filename
+
+
+def add_date_stage(post):
+    """
+    Add a date field to the YAML front matter based on the date in the
+    filename.
+    """
+    # Extract date from filename (YYYY-MM-DD-title.md)
+    date_match = re.match(r'(\d{4}-\d{2}-\d{2})-(.*?)\.md', post.filename)
+    if not date_match:
+        return f"Skipping {post.filename}: Could not extract date from filename."
+
+    date = date_match.group(1)
+
+    # Check if file has YAML front matter
+    frontmatter = post.document.frontmatter
+    if frontmatter is None:
+        return f"Skipping {post.filename}: No YAML front matter found."
+
+    # Check if date field already exists
+    if 'date' in frontmatter:
+        return f"Skipping {post.filename}: Date field already exists."
+
+    # Insert after title line, or at the beginning if there isn't one
+    frontmatter.insert(frontmatter.index('title') + 1, 'date', date)
+
+    return f"Updated {post.filename} with date: {date}"
+
+
+def list_value(frontmatter, key):
+    """A list field; like Jekyll, a plain string is a space separated list."""
+    value = frontmatter.get(key)
+    if isinstance(value, str):
+        return value.split()
+    return value or []
+
+
+def post_date(post):
+    """
+    The YYYY-MM-DD date of a post from its date field, or failing that its
+    filename, or None.
+    """
+    date = date_value(post.document.frontmatter.get('date'))
+    if date is not None:
+        return date
+
+    match = re.match(r'(\d{4}-\d{2}-\d{2})-', post.filename)
+    return match.group(1) if match else None
+
+
+def categories_to_tags_stage(post):
+    """
+    Move any categories into the tags section and remove the categories
+    section entirely. The resulting tags are recorded on the post for the
+    tag index.
+    """
+    message = move_categories_to_tags(post)
+
+    frontmatter = post.document.frontmatter
+    if frontmatter is not None:
+        post.taxonomy = (post_date(post), list_value(frontmatter, 'tags'))
+
+    return message
+
+
+def move_categories_to_tags(post):
+    # Check if file has YAML front matter
+    frontmatter = post.document.frontmatter
+    if frontmatter is None:
+        return f"Skipping {post.filename}: No YAML front matter found."
+
+    # Check if categories exist
+    if 'categories' not in frontmatter:
+        return f"Skipping {post.filename}: No categories section found."
+
+    categories = list_value(frontmatter, 'categories')
+    if not categories:
+        return f"Skipping {post.filename}: Categories section exists but contains no items."
+
+    # Categories go in front of any existing tags; a missing tags section
+    # is added at the end
+    tags = list_value(frontmatter, 'tags')
+    frontmatter.remove('categories')
+    frontmatter.set('tags', categories + tags)
+
+    return f"Updated {post.filename}: Moved {len(categories)} categories to tags"
+
+
+def fix_urls_stage(post):
+    """
+    URL encode spaces in markdown image URLs.
+    """
+    file_replacements = 0
+
+    # Regular expression to match markdown image syntax
+    # Captures: ![alt text](/path/with spaces/image.jpg)
+    image_pattern = r'!\[(.*?)\]\((.*?)\)'
+
+    def encode_url(match):
+        nonlocal file_replacements
+        alt_text = match.group(1)
+        url = match.group(2)
+
+        # Check if URL contains spaces
+        if ' ' not in url:
+            return match.group(0)
+
+        # Split the URL to preserve any potential query parameters or fragment identifiers
+        url_parts = url.split('?', 1)
+        path = url_parts[0]
+        query = f"?{url_parts[1]}" if len(url_parts) > 1 else ""
+
+        # Encode spaces in the path part
+        encoded_url = path.replace(' ', '%20') + query
+
+        file_replacements += 1
+        return f'![{alt_text}]({encoded_url})'
+
+    # Replace image URLs with encoded versions
+    new_content = re.sub(image_pattern, encode_url, post.content)
+
+    if file_replacements == 0:
+        return f"Skipping {post.filename}: No image URLs with spaces found."
+
+    post.content = new_content
+    post.counters['url_encodings'] = post.counters.get('url_encodings', 0) + file_replacements
+
+    return f"Updated {post.filename}: Encoded {file_replacements} image URLs"
+
+
+def fix_urls_summary(counters):
+    return f" with {counters.get('url_encodings', 0)} total URL encodings"
+
+
+# Available stages, by the name used on the command line
+STAGES = {
+    'add-date': Stage('add-date', add_date_stage, uses_filename=True),
+    'categories-to-tags': Stage('categories-to-tags', categories_to_tags_stage),
+    'fix-urls': Stage('fix-urls', fix_urls_stage, fix_urls_summary),
+}
+
+
+def write_atomic(path, content):
+    """
+    Write content to path through a temporary file in the same directory
+    followed by a rename, so an interrupted run never leaves a half-written
+    post behind.
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+        if path.exists():
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def process_file(md_file, stage_names):
+    """
+    Read one post, run every stage on it and write it back if any stage
+    changed it. Returns (messages, modified, counters, hashes, taxonomy)
+    where hashes is the (before, after) content hash pair used by the
+    manifest and taxonomy is the post's (date, tags) for the tag index.
+    """
+    with open(md_file, 'rb') as file:
+        raw = file.read()
+    content = raw.decode('utf-8').replace('\r\n', '\n')
+
+    post = Post(md_file, content)
+    messages = [STAGES[name].apply(post) for name in stage_names]
+
+    before = hash_bytes(raw)
+    after = before
+    modified = post.content != content
+    if modified:
+        write_atomic(md_file, post.content)
+        after = hash_bytes(post.content.encode('utf-8'))
+
+    return messages, modified, post.counters, (before, after), post.taxonomy
+
+
+def run_pipeline(directory_path, stage_names, jobs=1, use_manifest=False, tag_index=None):
+    """
+    Process all markdown files in the given directory through the named
+    stages, in order. With jobs > 1 the files are sharded across a pool of
+    worker processes. With use_manifest, posts that already had these
+    stages applied and haven't changed since are skipped. A TagIndex is
+    updated with the tags of every processed post when the
+    categories-to-tags stage runs.
+    """
+    # Ensure the directory exists
+    if not os.path.isdir(directory_path):
+        print(f"Error: Directory '{directory_path}' does not exist.")
+        return False
+
+    stages = [STAGES[name] for name in stage_names]
+    if 'categories-to-tags' not in stage_names:
+        tag_index = None
+
+    # Find all markdown files in the directory
+    md_files = list(Path(directory_path).glob('*.md'))
+    print(f"Found {len(md_files)} markdown files.")
+
+    if tag_index is not None:
+        tag_index.prune(md_file.name for md_file in md_files)
+
+    manifest = None
+    skipped_count = 0
+    if use_manifest:
+        manifest = Manifest(directory_path)
+        manifest.prune(md_files)
+        # Posts missing from the tag index can't be skipped
+        pending = [md_file for md_file in md_files
+                   if not manifest.is_current(md_file, stages)
+                   or (tag_index is not None and md_file.name not in tag_index)]
+        skipped_count = len(md_files) - len(pending)
+        md_files = pending
+
+    # Counters for modified files and per-stage totals
+    modified_count = 0
+    counters = {}
+
+    def merge(results):
+        nonlocal modified_count
+        for md_file, (messages, modified, file_counters, hashes, taxonomy) in zip(md_files, results):
+            if tag_index is not None:
+                tag_index.update(md_file.name, *(taxonomy or (None, None)))
+            if manifest:
+                before, after = hashes
+                applied = set(stage_names).union(manifest.previous_stages(md_file, before))
+                manifest.record(md_file, after, applied)
+            for message in messages:
+                print(message)
+            if modified:
+                modified_count += 1
+            for key, value in file_counters.items():
+                counters[key] = counters.get(key, 0) + value
+
+    if jobs > 1 and len(md_files) > 1:
+        # Results come back in file order so the output matches a serial run
+        chunksize = max(1, len(md_files) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            merge(executor.map(process_file, md_files, repeat(stage_names), chunksize=chunksize))
+    else:
+        merge(process_file(md_file, stage_names) for md_file in md_files)
+
+    if manifest:
+        manifest.save()
+        print(f"Skipped {skipped_count} unchanged files.")
+
+    if tag_index is not None:
+        tag_count = tag_index.save()
+        print(f"Wrote tag index {tag_index.path} with {tag_count} tags.")
+
+    summary = f"{modified_count} files were modified"
+    for stage in stages:
+        if stage.summary:
+            summary += stage.summary(counters)
+
+    print(f"\nOperation complete: {summary}.")
+    return True
+
+
+def open_tag_index(path, aliases_path=None):
+    aliases = None
+    if aliases_path:
+        with open(aliases_path, 'r', encoding='utf-8') as f:
+            aliases = json.load(f)
+    return TagIndex(path, aliases)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run blog post transforms in a single pass.")
+    parser.add_argument("directory", help="Directory containing markdown files to process")
+    parser.add_argument("--stages", nargs='+', choices=list(STAGES), required=True,
+                        help="Stages to run, in order")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--manifest", action="store_true",
+                        help="Skip posts unchanged since the last run (uses .blog-manifest.json)")
+    parser.add_argument("--tag-index", help="Update this JSON tag index (needs the categories-to-tags stage)")
+    parser.add_argument("--tag-aliases", help="JSON file mapping tag aliases to their canonical tag")
+
+    args = parser.parse_args()
+
+    tag_index = None
+    if args.tag_index:
+        if 'categories-to-tags' not in args.stages:
+            parser.error("--tag-index needs the categories-to-tags stage")
+        tag_index = open_tag_index(args.tag_index, args.tag_aliases)
+
+    if not run_pipeline(args.directory, args.stages, args.jobs, args.manifest, tag_index):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
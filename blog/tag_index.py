@@ -0,0 +1,93 @@
+'''
+Tag index for the site, built while categories-to-tags already has each
+post's front matter parsed.
+
+The JSON file keeps the raw tags of every post, keyed by filename, so it
+can be updated incrementally: only posts that were processed in this run
+are replaced and posts that no longer exist are dropped. The per-tag
+section (normalized tag -> count and posts) is rebuilt from that in memory
+on every save, so changing the aliases doesn't need a rescan.
+'''
+import os
+import re
+import json
+
+from front_matter import unquote
+
+post_date_re = re.compile(r'^(\d{4}-\d{2}-\d{2})-(.*)\.md$')
+
+
+def post_slug(filename):
+    """Jekyll slug and date from a YYYY-MM-DD-title.md filename."""
+    m = post_date_re.match(filename)
+    if m:
+        return m.group(2), m.group(1)
+    return os.path.splitext(filename)[0], None
+
+
+class TagIndex(object):
+    def __init__(self, path, aliases=None):
+        self.path = path
+        self.posts = {}
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.posts = json.load(f)['posts']
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError):
+            print(f"Warning: Rebuilding unreadable tag index {path}")
+
+        self.aliases = {}
+        for alias, tag in (aliases or {}).items():
+            self.aliases[self.clean(alias)] = self.clean(tag)
+
+    def __contains__(self, filename):
+        return filename in self.posts
+
+    @staticmethod
+    def clean(tag):
+        """Case and whitespace normalization."""
+        return ' '.join(unquote(str(tag).strip()).split()).lower()
+
+    def normalize(self, tag):
+        tag = self.clean(tag)
+        return self.aliases.get(tag, tag)
+
+    def update(self, filename, date, tags):
+        """Replace the entry for one post; tags None removes it."""
+        if tags is None:
+            self.posts.pop(filename, None)
+            return
+
+        slug, filename_date = post_slug(filename)
+        self.posts[filename] = {
+            'slug': slug,
+            'date': date or filename_date,
+            'tags': list(tags),
+        }
+
+    def prune(self, filenames):
+        """Drop posts that no longer exist."""
+        filenames = set(filenames)
+        self.posts = {name: post for name, post in self.posts.items() if name in filenames}
+
+    def tags(self):
+        tags = {}
+        for post in self.posts.values():
+            for tag in dict.fromkeys(self.normalize(tag) for tag in post['tags']):
+                if tag:
+                    tags.setdefault(tag, []).append({'slug': post['slug'], 'date': post['date']})
+
+        index = {}
+        for tag in sorted(tags):
+            posts = sorted(tags[tag], key=lambda post: (post['date'] or '', post['slug']), reverse=True)
+            index[tag] = {'count': len(posts), 'posts': posts}
+        return index
+
+    def save(self):
+        data = {'tags': self.tags(), 'posts': self.posts}
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(self.path + '.tmp', self.path)
+        return len(data['tags'])
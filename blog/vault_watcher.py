@@ -0,0 +1,233 @@
+'''
+Watch an Obsidian vault and re-export notes when they, or the attachments
+they embed, change.
+
+Uses inotify on Linux and falls back to polling mtimes elsewhere. Bursts of
+events (editors often write a file several times per save) are debounced
+into one batch, and a note is only re-exported if its content or one of its
+referenced attachments actually changed.
+'''
+import os
+import time
+import errno
+import select
+import struct
+import hashlib
+import ctypes
+import ctypes.util
+
+# From sys/inotify.h
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+
+event_header = struct.Struct('iIII')
+
+
+def walk_dirs(vault_dir):
+    """Vault directories, skipping hidden ones like .obsidian"""
+    for root, dirs, _ in os.walk(vault_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        yield root
+
+
+class InotifyWatcher(object):
+    ''' Recursive directory watch using inotify through libc '''
+    def __init__(self, vault_dir):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, 'libc not found')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify not available')
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.dirs = {}
+        for directory in walk_dirs(vault_dir):
+            self.add_watch(directory)
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = directory
+
+    def read(self, timeout):
+        """Return the set of paths changed within timeout seconds."""
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = event_header.unpack_from(data, offset)
+            offset += event_header.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.'):
+                    for subdir in walk_dirs(path):
+                        self.add_watch(subdir)
+            else:
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(object):
+    ''' Fallback that compares file mtimes every poll interval '''
+    def __init__(self, vault_dir, interval=0.5):
+        self.vault_dir = vault_dir
+        self.interval = interval
+        self.mtimes = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        for directory in walk_dirs(self.vault_dir):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            mtimes[entry.path] = entry.stat().st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        mtimes = self.scan()
+        changed = {path for path, mtime in mtimes.items() if self.mtimes.get(path) != mtime}
+        changed.update(path for path in self.mtimes if path not in mtimes)
+        self.mtimes = mtimes
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(vault_dir):
+    try:
+        watcher = InotifyWatcher(vault_dir)
+        print("Watching with inotify")
+    except OSError:
+        watcher = PollingWatcher(vault_dir)
+        print("Watching by polling mtimes")
+    return watcher
+
+
+class VaultWatcher(object):
+    '''
+    Tracks a fingerprint per note (content hash plus the size and mtime of
+    each referenced attachment) and calls export_note for notes whose
+    fingerprint changed.
+
+    find_attachments(note_path, content) returns the attachment paths a
+    note embeds.
+    '''
+    def __init__(self, vault_dir, export_note, find_attachments, debounce=0.3):
+        self.vault_dir = vault_dir
+        self.export_note = export_note
+        self.find_attachments = find_attachments
+        self.debounce = debounce
+
+        self.fingerprints = {}
+        # attachment path -> notes that embed it
+        self.embedded_by = {}
+
+    def fingerprint(self, note_path):
+        try:
+            with open(note_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None, []
+
+        attachments = self.find_attachments(note_path, data.decode('utf-8', errors='replace'))
+        digest = hashlib.sha256(data)
+        for attachment in attachments:
+            try:
+                stat = os.stat(attachment)
+                digest.update(f'{attachment}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode())
+            except FileNotFoundError:
+                digest.update(f'{attachment}\0missing\0'.encode())
+        return digest.hexdigest(), attachments
+
+    def update(self, note_path):
+        """Re-export note_path if it changed. Returns True if exported."""
+        fingerprint, attachments = self.fingerprint(note_path)
+
+        for notes in self.embedded_by.values():
+            notes.discard(note_path)
+        for attachment in attachments:
+            self.embedded_by.setdefault(attachment, set()).add(note_path)
+
+        if fingerprint is None:
+            self.fingerprints.pop(note_path, None)
+            return False
+        if self.fingerprints.get(note_path) == fingerprint:
+            return False
+
+        self.fingerprints[note_path] = fingerprint
+        self.export_note(note_path)
+        return True
+
+    def notes_for(self, changed):
+        notes = set()
+        for path in changed:
+            if path.endswith('.md'):
+                notes.add(path)
+            notes.update(self.embedded_by.get(path, ()))
+        return notes
+
+    def run(self, notes):
+        """Record the initial notes, then watch until interrupted."""
+        for note in notes:
+            self.fingerprints[note], attachments = self.fingerprint(note)
+            for attachment in attachments:
+                self.embedded_by.setdefault(attachment, set()).add(note)
+
+        watcher = open_watcher(self.vault_dir)
+        try:
+            while True:
+                changed = watcher.read(timeout=1.0)
+                if not changed:
+                    continue
+
+                # Debounce: keep collecting until the vault is quiet
+                while True:
+                    more = watcher.read(timeout=self.debounce)
+                    if not more:
+                        break
+                    changed |= more
+
+                exported = [note for note in sorted(self.notes_for(changed)) if self.update(note)]
+                if exported:
+                    print(f"Re-exported {len(exported)} changed notes")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
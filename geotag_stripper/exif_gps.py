@@ -0,0 +1,307 @@
+"""
+Read GPS tags from image headers without opening the image.
+
+For JPEG only the markers up to the EXIF APP1 segment are read, for PNG
+and WebP only the chunk headers up to the EXIF chunk, so a scan touches a
+few kilobytes per photo instead of decoding it. The EXIF block is then
+parsed just far enough to reach the GPS IFD.
+
+The segment and chunk walkers here are shared with metadata_probe and
+native_strip. They work on any seekable binary file, mmaps included, and
+only read a segment's payload if asked to.
+
+Returns GPS data in the same shape as PIL's _getexif()[GPSInfo]:
+{tag id: value}, with BYTE fields as bytes, rationals as floats and text
+as str.
+"""
+import struct
+
+GPS_INFO_TAG = 0x8825
+
+# TIFF field types: (struct format, size in bytes)
+TIFF_TYPES = {
+    1: ('B', 1),   # BYTE
+    2: ('s', 1),   # ASCII
+    3: ('H', 2),   # SHORT
+    4: ('L', 4),   # LONG
+    5: ('LL', 8),  # RATIONAL
+    6: ('b', 1),   # SBYTE
+    7: ('s', 1),   # UNDEFINED
+    8: ('h', 2),   # SSHORT
+    9: ('l', 4),   # SLONG
+    10: ('ll', 8), # SRATIONAL
+    11: ('f', 4),  # FLOAT
+    12: ('d', 8),  # DOUBLE
+}
+
+# APP1 segments and PNG eXIf chunks are at most this big anyway
+MAX_EXIF_SIZE = 1 << 20
+
+JPEG_SOI = b'\xff\xd8'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Markers without a length field: TEM and RST0-7
+JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+JPEG_SOS = 0xDA
+JPEG_EOI = 0xD9
+JPEG_APP1 = 0xE1
+
+
+class NoHeaderExif(Exception):
+    """The file isn't a format whose EXIF can be found from its headers."""
+
+
+def file_size(f):
+    """Size of an open file, leaving its position alone."""
+    position = f.tell()
+    # mmap.seek() doesn't return the new position before Python 3.13
+    f.seek(0, 2)
+    size = f.tell()
+    f.seek(position)
+    return size
+
+
+def _reader(f, start, count):
+    def read():
+        f.seek(start)
+        return f.read(count)
+    return read
+
+
+def jpeg_segments(f):
+    """
+    Yield (marker, offset, length, read) for each segment of a JPEG after
+    SOI, up to and including the start of scan or end of image. The
+    segment is the length bytes at offset, fill bytes included, and read()
+    returns its payload. Raises ValueError if the file is corrupt.
+    """
+    f.seek(0)
+    if f.read(2) != JPEG_SOI:
+        raise ValueError('Not a JPEG file')
+    size = file_size(f)
+
+    while True:
+        offset = f.tell()
+        marker = f.read(2)
+        if not marker:
+            return
+        if marker[0] != 0xFF:
+            raise ValueError(f'Corrupt JPEG: no marker at offset {offset}')
+        # Markers can be padded with any number of 0xFF fill bytes
+        while len(marker) == 2 and marker[1] == 0xFF:
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2:
+            raise ValueError('Corrupt JPEG: truncated marker')
+        marker = marker[1]
+        header_end = f.tell()
+
+        if marker in JPEG_STANDALONE_MARKERS or marker == JPEG_EOI:
+            yield marker, offset, header_end - offset, lambda: b''
+            if marker == JPEG_EOI:
+                return
+            f.seek(header_end)
+            continue
+
+        length = f.read(2)
+        if len(length) < 2:
+            raise ValueError('Corrupt JPEG: truncated segment')
+        length = int.from_bytes(length, 'big')
+        end = header_end + length
+        if length < 2 or end > size:
+            raise ValueError(f'Corrupt JPEG: bad segment length at offset {offset}')
+
+        yield marker, offset, end - offset, _reader(f, header_end + 2, length - 2)
+        # Entropy-coded data follows, the rest is image data
+        if marker == JPEG_SOS:
+            return
+        f.seek(end)
+
+
+def png_chunks(f):
+    """
+    Yield (chunk type, offset, length, read) for each chunk of a PNG, up
+    to and including IEND. length covers the length field, type, data and
+    CRC, read() returns the data. Raises ValueError if the file is corrupt.
+    """
+    f.seek(0)
+    if f.read(8) != PNG_SIGNATURE:
+        raise ValueError('Not a PNG file')
+    size = file_size(f)
+
+    while True:
+        offset = f.tell()
+        header = f.read(8)
+        if not header:
+            return
+        if len(header) < 8:
+            raise ValueError('Corrupt PNG: truncated chunk')
+        length = int.from_bytes(header[:4], 'big')
+        chunk_type = header[4:]
+        end = offset + 12 + length
+        if end > size:
+            raise ValueError(f'Corrupt PNG: bad chunk length at offset {offset}')
+
+        yield chunk_type, offset, end - offset, _reader(f, offset + 8, length)
+        if chunk_type == b'IEND':
+            return
+        f.seek(end)
+
+
+def webp_chunks(f):
+    """
+    Yield (chunk type, offset, length, read) for each chunk of a WebP.
+    length covers the header, data and padding, read() returns the data.
+    Raises ValueError if the file is corrupt.
+    """
+    f.seek(0)
+    header = f.read(12)
+    if header[:4] != b'RIFF' or header[8:12] != b'WEBP':
+        raise ValueError('Not a WebP file')
+    size = file_size(f)
+
+    while True:
+        offset = f.tell()
+        header = f.read(8)
+        if not header:
+            return
+        if len(header) < 8:
+            raise ValueError('Corrupt WebP: truncated chunk')
+        length = int.from_bytes(header[4:], 'little')
+        # Chunks are padded to an even size
+        end = offset + 8 + length + (length & 1)
+        if offset + 8 + length > size:
+            raise ValueError(f'Corrupt WebP: bad chunk length at offset {offset}')
+
+        yield header[:4], offset, end - offset, _reader(f, offset + 8, length)
+        f.seek(end)
+
+
+def _jpeg_exif(f):
+    for marker, _, _, read in jpeg_segments(f):
+        if marker == JPEG_APP1:
+            data = read()
+            if data.startswith(b'Exif\x00\x00'):
+                return data[6:]
+    return None
+
+
+def _png_exif(f):
+    for chunk_type, _, length, read in png_chunks(f):
+        if chunk_type == b'eXIf':
+            return read() if length <= MAX_EXIF_SIZE else None
+        # EXIF has to come before the image data
+        if chunk_type == b'IDAT':
+            return None
+    return None
+
+
+def webp_exif_data(data):
+    """Strip the JPEG style header some writers put in WebP EXIF chunks."""
+    if data.startswith(b'Exif\x00\x00'):
+        return data[6:]
+    return data
+
+
+def _webp_exif(f):
+    for chunk_type, _, length, read in webp_chunks(f):
+        if chunk_type == b'EXIF':
+            return webp_exif_data(read()) if length <= MAX_EXIF_SIZE else None
+    return None
+
+
+def read_exif_block(path):
+    """
+    The raw EXIF (TIFF structure) bytes of a JPEG, PNG or WebP, or None if
+    it has none or is corrupt. Raises NoHeaderExif for other formats.
+    """
+    with open(path, 'rb') as f:
+        start = f.read(12)
+        if start[:2] == JPEG_SOI:
+            read_block = _jpeg_exif
+        elif start[:8] == PNG_SIGNATURE:
+            read_block = _png_exif
+        elif start[:4] == b'RIFF' and start[8:12] == b'WEBP':
+            read_block = _webp_exif
+        else:
+            raise NoHeaderExif(path)
+
+        try:
+            return read_block(f)
+        except ValueError:
+            return None
+
+
+def _read_ifd(data, offset, byte_order):
+    """{tag: value} for one IFD."""
+    count, = struct.unpack_from(byte_order + 'H', data, offset)
+    entries = {}
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, field_type, value_count = struct.unpack_from(byte_order + 'HHL', data, entry)
+        if field_type not in TIFF_TYPES:
+            continue
+
+        fmt, size = TIFF_TYPES[field_type]
+        total = size * value_count
+        if total <= 4:
+            value_offset = entry + 8
+        else:
+            value_offset, = struct.unpack_from(byte_order + 'L', data, entry + 8)
+        if value_offset + total > len(data):
+            continue
+
+        if fmt == 's':
+            raw = data[value_offset:value_offset + total]
+            if field_type == 2:
+                entries[tag] = raw.split(b'\x00', 1)[0].decode('ascii', 'replace')
+            else:
+                entries[tag] = raw
+            continue
+
+        values = struct.unpack_from(f'{byte_order}{value_count * len(fmt)}{fmt[0]}', data, value_offset)
+        if len(fmt) == 2:
+            values = tuple(n / d if d else float('nan') for n, d in zip(values[::2], values[1::2]))
+        if field_type == 1:
+            entries[tag] = bytes(values)
+        elif value_count == 1:
+            entries[tag] = values[0]
+        else:
+            entries[tag] = values
+    return entries
+
+
+def parse_gps(data):
+    """The GPS IFD of an EXIF block as {tag id: value}, or None."""
+    if len(data) < 8:
+        return None
+    if data[:2] == b'II':
+        byte_order = '<'
+    elif data[:2] == b'MM':
+        byte_order = '>'
+    else:
+        return None
+
+    try:
+        ifd0_offset, = struct.unpack_from(byte_order + 'L', data, 4)
+        gps_offset = _read_ifd(data, ifd0_offset, byte_order).get(GPS_INFO_TAG)
+        if not isinstance(gps_offset, int):
+            return None
+        return _read_ifd(data, gps_offset, byte_order)
+    except struct.error:
+        return None
+
+
+def read_gps(path):
+    """GPS tags of an image, from the headers where possible."""
+    try:
+        data = read_exif_block(path)
+    except NoHeaderExif:
+        # TIFF keeps its IFDs anywhere in the file, let Pillow find them
+        from PIL import Image
+
+        with Image.open(path) as image:
+            return dict(image.getexif().get_ifd(GPS_INFO_TAG)) or None
+
+    if not data:
+        return None
+    return parse_gps(data)
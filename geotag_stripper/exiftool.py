@@ -0,0 +1,125 @@
+"""
+Persistent exiftool processes.
+
+Starting exiftool means starting a Perl interpreter, which costs far more
+than stripping a typical photo. With -stay_open one process reads commands
+from stdin for the whole run instead, and a pool of them strips files in
+parallel.
+"""
+import queue
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+INSTALL_HINT = 'Please install it using: sudo apt-get install libimage-exiftool-perl'
+
+
+def exiftool_version():
+    """Installed exiftool version, raises FileNotFoundError if there is none."""
+    result = subprocess.run(['exiftool', '-ver'], capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+class ExifTool(object):
+    """One exiftool process in -stay_open mode."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ['exiftool', '-stay_open', 'True', '-@', '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding='utf-8',
+            errors='replace',
+        )
+        self.sequence = 0
+
+    def _read_until(self, stream, marker):
+        lines = []
+        for line in stream:
+            if line.rstrip('\n') == marker:
+                return ''.join(lines)
+            lines.append(line)
+        raise RuntimeError('exiftool exited unexpectedly')
+
+    def execute(self, *args):
+        """Run one command, returns (stdout, stderr)."""
+        # The argument file format has one argument per line
+        if any('\n' in arg for arg in args):
+            raise ValueError('exiftool arguments cannot contain newlines')
+
+        self.sequence += 1
+        ready = f'{{ready{self.sequence}}}'
+        # -echo4 marks the end of this command's stderr the way
+        # -execute marks the end of its stdout
+        command = list(args) + ['-echo4', ready, f'-execute{self.sequence}']
+        self.process.stdin.write('\n'.join(command) + '\n')
+        self.process.stdin.flush()
+
+        stdout = self._read_until(self.process.stdout, ready)
+        stderr = self._read_until(self.process.stderr, ready)
+        return stdout, stderr
+
+    def close(self):
+        if self.process.returncode is not None:
+            return
+        try:
+            self.process.stdin.write('-stay_open\nFalse\n')
+            self.process.stdin.flush()
+        except OSError:
+            pass
+        self.process.communicate()
+
+
+def strip_file(exiftool, path):
+    """Remove all metadata from one file in place, returns (ok, message)."""
+    try:
+        stdout, stderr = exiftool.execute('-all=', '-overwrite_original', path)
+    except ValueError as e:
+        return False, str(e)
+
+    updated = '1 image files updated' in stdout or '1 image files unchanged' in stdout
+    if 'Error' in stderr or not updated:
+        return False, (stderr or stdout).strip()
+    return True, stdout.strip()
+
+
+class ExifToolPool(object):
+    """
+    Strips files with several persistent exiftool processes, one per worker
+    thread.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.idle = queue.Queue()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def _strip(self, path):
+        try:
+            exiftool = self.idle.get_nowait()
+        except queue.Empty:
+            exiftool = ExifTool()
+            with self.lock:
+                self.started.append(exiftool)
+
+        try:
+            ok, message = strip_file(exiftool, path)
+        except (OSError, RuntimeError) as e:
+            # The process died, the next file gets a new one
+            exiftool.close()
+            return path, False, str(e)
+
+        self.idle.put(exiftool)
+        return path, ok, message
+
+    def strip(self, paths):
+        """Yield (path, ok, message) for each path, in order."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(self._strip, paths)
+
+    def close(self):
+        for exiftool in self.started:
+            exiftool.close()
+        self.started = []
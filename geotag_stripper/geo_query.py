@@ -0,0 +1,109 @@
+"""
+Radius and bounding box queries over geotagged photos.
+
+Points are bucketed into a grid of CELL_DEGREES cells, so a query only
+looks at the cells its bounding box overlaps instead of every photo.
+Radius queries use the bounding box of the circle to pick cells and then
+the haversine distance to filter and sort. Boxes that cross the
+antimeridian (west > east) are supported.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 0.5
+LON_CELLS = int(360 / CELL_DEGREES)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great circle distance in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def normalize_longitude(lon):
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+def _lon_in_range(lon, west, east):
+    if west <= east:
+        return west <= lon <= east
+    return lon >= west or lon <= east
+
+
+class GridIndex(object):
+    def __init__(self, points):
+        """points: iterable of (item, latitude, longitude), item is anything."""
+        self.cells = {}
+        self.count = 0
+        for item, lat, lon in points:
+            if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+                continue
+            lon = normalize_longitude(lon)
+            self.cells.setdefault(self._cell(lat, lon), []).append((item, lat, lon))
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _cell(lat, lon):
+        return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES) % LON_CELLS
+
+    def _candidate_cells(self, south, west, north, east):
+        lat_cells = range(math.floor(south / CELL_DEGREES), math.floor(north / CELL_DEGREES) + 1)
+
+        first = math.floor(west / CELL_DEGREES)
+        last = math.floor(east / CELL_DEGREES)
+        if west > east:
+            last += LON_CELLS
+        lon_cells = [i % LON_CELLS for i in range(first, min(last, first + LON_CELLS - 1) + 1)]
+
+        # For big boxes walking the occupied cells is cheaper
+        if len(lat_cells) * len(lon_cells) > len(self.cells):
+            lat_range = (lat_cells.start, lat_cells.stop - 1)
+            lon_set = set(lon_cells)
+            for key, points in self.cells.items():
+                if lat_range[0] <= key[0] <= lat_range[1] and key[1] in lon_set:
+                    yield points
+            return
+
+        for lat_cell in lat_cells:
+            for lon_cell in lon_cells:
+                points = self.cells.get((lat_cell, lon_cell))
+                if points:
+                    yield points
+
+    def bbox(self, south, west, north, east):
+        """Yield (item, lat, lon) inside the box."""
+        west = normalize_longitude(west)
+        east = normalize_longitude(east) if east != 180 else 180.0
+        for points in self._candidate_cells(south, west, north, east):
+            for item, lat, lon in points:
+                if south <= lat <= north and _lon_in_range(lon, west, east):
+                    yield item, lat, lon
+
+    def radius(self, lat, lon, km):
+        """List of (distance km, item, lat, lon) within km of a point, nearest first."""
+        angle = km / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        south = max(-90.0, lat - dlat)
+        north = min(90.0, lat + dlat)
+
+        # Widest longitude span of the circle; around the poles it's everything
+        if north >= 90.0 or south <= -90.0 or math.sin(angle) >= math.cos(math.radians(lat)):
+            west, east = -180.0, 180.0
+        else:
+            dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            west, east = lon - dlon, lon + dlon
+            if east - west >= 360.0:
+                west, east = -180.0, 180.0
+
+        matches = []
+        for item, point_lat, point_lon in self.bbox(south, west, north, east):
+            distance = haversine_km(lat, lon, point_lat, point_lon)
+            if distance <= km:
+                matches.append((distance, item, point_lat, point_lon))
+        matches.sort(key=lambda match: match[0])
+        return matches
@@ -0,0 +1,148 @@
+"""
+Persistent geotag index for print_geotags.
+
+Results are stored in SQLite keyed by absolute path together with the
+file's size and mtime. A rescan stats every file but only reads the ones
+that are new or whose size or mtime changed, and drops entries for files
+that are gone. Reports are then served from the index.
+"""
+import os
+import json
+import sqlite3
+import multiprocessing
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'print_geotags', 'geotags.sqlite')
+
+# Rows written per transaction while scanning
+COMMIT_EVERY = 1000
+
+
+def _plain(value):
+    """GPS tag values as something JSON can hold."""
+    if isinstance(value, bytes):
+        return {'hex': value.hex()}
+    if isinstance(value, (tuple, list)):
+        return [_plain(v) for v in value]
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    # PIL's IFDRational from the TIFF fallback
+    return float(value)
+
+
+def _unplain(value):
+    if isinstance(value, list):
+        return tuple(_unplain(v) for v in value)
+    if isinstance(value, dict):
+        return bytes.fromhex(value['hex'])
+    return value
+
+
+class GeotagIndex(object):
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS photos ('
+            ' path TEXT PRIMARY KEY,'
+            ' size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' latitude REAL,'
+            ' longitude REAL,'
+            ' geotagging TEXT,'
+            ' error TEXT)'
+        )
+        self.db.commit()
+
+    @staticmethod
+    def _prefix_range(directory):
+        """Bounds for the paths under directory, for a range query."""
+        prefix = os.path.join(os.path.abspath(directory), '')
+        return prefix, prefix + '\U0010ffff'
+
+    def _known(self, directory):
+        rows = self.db.execute(
+            'SELECT path, size, mtime_ns FROM photos WHERE path >= ? AND path < ?',
+            self._prefix_range(directory),
+        )
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def _store(self, rows):
+        self.db.executemany(
+            'INSERT OR REPLACE INTO photos (path, size, mtime_ns, latitude, longitude, geotagging, error)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            rows,
+        )
+        self.db.commit()
+
+    def update(self, image_paths, directory, scan_file, jobs=1):
+        """
+        Bring the index up to date for the images under directory. scan_file
+        is print_geotags.scan_file. Returns (scanned, unchanged, removed).
+        """
+        known = self._known(directory)
+
+        changed = {}
+        unchanged = 0
+        for image_path in image_paths:
+            image_path = os.path.abspath(image_path)
+            try:
+                st = os.stat(image_path)
+            except OSError:
+                continue
+
+            stamp = known.pop(image_path, None)
+            if stamp == (st.st_size, st.st_mtime_ns):
+                unchanged += 1
+            else:
+                changed[image_path] = (st.st_size, st.st_mtime_ns)
+
+        # Whatever wasn't seen in the walk has been deleted
+        removed = len(known)
+        self.db.executemany('DELETE FROM photos WHERE path = ?', ((path,) for path in known))
+        self.db.commit()
+
+        if jobs > 1 and len(changed) > 1:
+            pool = multiprocessing.Pool(jobs)
+            results = pool.imap_unordered(scan_file, changed, chunksize=32)
+        else:
+            pool = None
+            results = map(scan_file, changed)
+
+        try:
+            rows = []
+            for image_path, geotagging, error in results:
+                size, mtime_ns = changed[image_path]
+                latitude = longitude = None
+                if geotagging:
+                    latitude = geotagging.get('DecimalLatitude')
+                    longitude = geotagging.get('DecimalLongitude')
+                    geotagging = json.dumps({tag: _plain(value) for tag, value in geotagging.items()})
+                rows.append((image_path, size, mtime_ns, latitude, longitude, geotagging or None, error))
+
+                if len(rows) >= COMMIT_EVERY:
+                    self._store(rows)
+                    rows = []
+            self._store(rows)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return len(changed), unchanged, removed
+
+    def results(self, directory):
+        """Yield (path, geotagging, error) for indexed files with GPS data or errors."""
+        rows = self.db.execute(
+            'SELECT path, geotagging, error FROM photos'
+            ' WHERE path >= ? AND path < ? AND (geotagging IS NOT NULL OR error IS NOT NULL)'
+            ' ORDER BY path',
+            self._prefix_range(directory),
+        )
+        for path, geotagging, error in rows:
+            if geotagging is not None:
+                geotagging = {tag: _unplain(value) for tag, value in json.loads(geotagging).items()}
+            yield path, geotagging, error
+
+    def close(self):
+        self.db.close()
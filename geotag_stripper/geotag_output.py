@@ -0,0 +1,75 @@
+"""
+Streaming JSON Lines, CSV and GeoJSON output for geotag results.
+
+Each record is written (and flushed) as soon as it's available, GeoJSON
+included: the FeatureCollection header goes out first and the closing
+brackets on close(), so output can be piped while a scan is running.
+"""
+import csv
+import json
+
+FORMATS = ['text', 'jsonl', 'csv', 'geojson']
+
+CSV_FIELDS = ['path', 'latitude', 'longitude', 'altitude', 'timestamp', 'url', 'distance_km']
+
+
+def gps_record(path, geotagging, distance_km=None):
+    """Flat record for one geotagged photo."""
+    altitude = geotagging.get('GPSAltitude')
+    if altitude is not None and geotagging.get('GPSAltitudeRef') in (1, b'\x01'):
+        altitude = -altitude
+
+    timestamp = None
+    if 'GPSDateStamp' in geotagging and 'GPSTimeStamp' in geotagging:
+        try:
+            h, m, s = geotagging['GPSTimeStamp']
+            date = geotagging['GPSDateStamp'].replace(':', '-')
+            timestamp = f"{date}T{int(h):02d}:{int(m):02d}:{float(s):06.3f}Z"
+        except (TypeError, ValueError, AttributeError):
+            pass
+
+    record = {
+        'path': path,
+        'latitude': geotagging['DecimalLatitude'],
+        'longitude': geotagging['DecimalLongitude'],
+        'altitude': float(altitude) if altitude is not None else None,
+        'timestamp': timestamp,
+        'url': geotagging.get('GoogleMapsURL'),
+    }
+    if distance_km is not None:
+        record['distance_km'] = round(distance_km, 4)
+    return record
+
+
+class RecordWriter(object):
+    def __init__(self, output, output_format):
+        self.output = output
+        self.output_format = output_format
+        self.count = 0
+
+        if output_format == 'csv':
+            self.writer = csv.DictWriter(output, CSV_FIELDS)
+            self.writer.writeheader()
+        elif output_format == 'geojson':
+            output.write('{"type": "FeatureCollection", "features": [\n')
+
+    def write(self, record):
+        if self.output_format == 'csv':
+            self.writer.writerow(record)
+        elif self.output_format == 'geojson':
+            properties = {key: value for key, value in record.items() if key not in ('latitude', 'longitude')}
+            feature = {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [record['longitude'], record['latitude']]},
+                'properties': properties,
+            }
+            self.output.write((',\n' if self.count else '') + json.dumps(feature))
+        else:
+            self.output.write(json.dumps(record) + '\n')
+        self.count += 1
+        self.output.flush()
+
+    def close(self):
+        if self.output_format == 'geojson':
+            self.output.write('\n]}\n')
+            self.output.flush()
@@ -0,0 +1,98 @@
+"""
+Cheap check for which kinds of metadata an image carries.
+
+Like exif_gps, and with the same segment and chunk walkers, only the
+headers are read: JPEG markers up to the start of scan, PNG chunk headers
+up to IEND and WebP chunk headers. Only EXIF blocks are read in full, to
+look for GPS tags. TIFF is left to Pillow, which reads just the first IFD.
+"""
+from exif_gps import (GPS_INFO_TAG, JPEG_APP1, JPEG_SOI, MAX_EXIF_SIZE, PNG_SIGNATURE,
+                      jpeg_segments, parse_gps, png_chunks, webp_chunks, webp_exif_data)
+
+CATEGORIES = ('gps', 'exif', 'xmp', 'iptc', 'comment')
+
+XMP_PNG_KEYWORD = b'XML:com.adobe.xmp\x00'
+
+JPEG_APP13 = 0xED
+JPEG_COM = 0xFE
+
+TIFF_EXIF_IFD_TAG = 0x8769
+TIFF_XMP_TAG = 700
+TIFF_IPTC_TAG = 33723
+
+
+def _exif_categories(data):
+    if parse_gps(data):
+        return {'exif', 'gps'}
+    return {'exif'}
+
+
+def _jpeg_categories(f):
+    found = set()
+    for marker, _, _, read in jpeg_segments(f):
+        if marker == JPEG_APP1:
+            data = read()
+            if data.startswith(b'Exif\x00\x00'):
+                found |= _exif_categories(data[6:])
+            else:
+                found.add('xmp')
+        elif marker == JPEG_APP13:
+            found.add('iptc')
+        elif marker == JPEG_COM:
+            found.add('comment')
+    return found
+
+
+def _png_categories(f):
+    found = set()
+    # Text chunks may also follow the image data, so read up to IEND
+    for chunk_type, _, length, read in png_chunks(f):
+        if chunk_type == b'eXIf':
+            found |= _exif_categories(read() if length <= MAX_EXIF_SIZE else b'')
+        elif chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+            keyword = read()[:len(XMP_PNG_KEYWORD)]
+            found.add('xmp' if keyword == XMP_PNG_KEYWORD else 'comment')
+    return found
+
+
+def _webp_categories(f):
+    found = set()
+    for chunk_type, _, length, read in webp_chunks(f):
+        if chunk_type == b'EXIF':
+            found |= _exif_categories(webp_exif_data(read()) if length <= MAX_EXIF_SIZE else b'')
+        elif chunk_type == b'XMP ':
+            found.add('xmp')
+    return found
+
+
+def _tiff_categories(path):
+    from PIL import Image
+
+    found = set()
+    with Image.open(path) as image:
+        exif = image.getexif()
+        if TIFF_EXIF_IFD_TAG in exif:
+            found.add('exif')
+        if GPS_INFO_TAG in exif:
+            found.add('gps')
+        if TIFF_XMP_TAG in exif:
+            found.add('xmp')
+        if TIFF_IPTC_TAG in exif:
+            found.add('iptc')
+    return found
+
+
+def probe(path):
+    """
+    Set of CATEGORIES present in an image. Raises ValueError if the
+    headers are corrupt.
+    """
+    with open(path, 'rb') as f:
+        start = f.read(12)
+        if start[:2] == JPEG_SOI:
+            return _jpeg_categories(f)
+        if start[:8] == PNG_SIGNATURE:
+            return _png_categories(f)
+        if start[:4] == b'RIFF' and start[8:12] == b'WEBP':
+            return _webp_categories(f)
+    return _tiff_categories(path)
@@ -0,0 +1,133 @@
+"""
+Lossless metadata stripping for JPEG and PNG in pure Python.
+
+Nothing is decoded or re-encoded: the file is split into segments (JPEG)
+or chunks (PNG) with the walkers from exif_gps, the metadata ones are left
+out and everything else is copied byte for byte. The input is memory-mapped and the output written in
+one sequential pass to a temporary file that then replaces the original.
+
+Removed from JPEG: APP1 (EXIF, XMP), APP13 (IPTC, Photoshop) and COM.
+Removed from PNG: eXIf, tEXt, iTXt and zTXt.
+Everything from the JPEG start of scan onwards is copied unchanged, as is
+anything after the PNG IEND chunk.
+"""
+import io
+import os
+import mmap
+import shutil
+import tempfile
+
+from exif_gps import JPEG_EOI, JPEG_SOS, file_size, jpeg_segments, png_chunks
+
+NATIVE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+PNG_METADATA_CHUNKS = {b'eXIf', b'tEXt', b'iTXt', b'zTXt'}
+
+
+def _keep(ranges, start, end):
+    """Append a byte range, merging it with the previous one if adjacent."""
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    else:
+        ranges.append((start, end))
+
+
+def jpeg_ranges(f):
+    """Byte ranges to keep and number of metadata segments in a JPEG file."""
+    ranges = [(0, 2)]
+    removed = 0
+    for marker, offset, length, _ in jpeg_segments(f):
+        if marker in (JPEG_SOS, JPEG_EOI):
+            # Entropy-coded data, further scans and anything appended
+            # after the image are kept as they are
+            _keep(ranges, offset, file_size(f))
+        elif marker in JPEG_METADATA_MARKERS:
+            removed += 1
+        else:
+            _keep(ranges, offset, offset + length)
+    return ranges, removed
+
+
+def png_ranges(f):
+    """Byte ranges to keep and number of metadata chunks in a PNG file."""
+    ranges = [(0, 8)]
+    removed = 0
+    for chunk_type, offset, length, _ in png_chunks(f):
+        if chunk_type in PNG_METADATA_CHUNKS:
+            removed += 1
+        elif chunk_type == b'IEND':
+            # Keep anything appended after the image as well
+            _keep(ranges, offset, file_size(f))
+        else:
+            _keep(ranges, offset, offset + length)
+    return ranges, removed
+
+
+def metadata_ranges(path, f):
+    """Dispatch on the file extension."""
+    if os.path.splitext(path.lower())[1] == '.png':
+        return png_ranges(f)
+    return jpeg_ranges(f)
+
+
+def _decode_pixels(path):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    with Image.open(path) as image:
+        return image.tobytes()
+
+
+def verify_stripped(path, kept, stripped_path):
+    """
+    Check that the stripped file has no metadata segments left, that it is
+    exactly the segments that were kept, and (if Pillow is installed) that
+    it decodes to the same pixels as the original.
+    """
+    with open(stripped_path, 'rb') as f:
+        stripped = f.read()
+
+    if metadata_ranges(path, io.BytesIO(stripped))[1]:
+        raise ValueError('Metadata left after stripping')
+    if stripped != kept:
+        raise ValueError('Stripped file differs from the kept segments')
+    if _decode_pixels(path) != _decode_pixels(stripped_path):
+        raise ValueError('Pixel data changed while stripping')
+
+
+def strip_image(path, verify=False):
+    """
+    Remove metadata from a JPEG or PNG in place. Returns the number of
+    segments removed; files without any are left untouched. Raises
+    ValueError for files that can't be parsed.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError('Empty file')
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            ranges, removed = metadata_ranges(path, data)
+            if not removed:
+                return 0
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.strip-')
+            try:
+                with memoryview(data) as view:
+                    with os.fdopen(fd, 'wb') as out:
+                        for start, end in ranges:
+                            out.write(view[start:end])
+
+                    if verify:
+                        kept = b''.join(view[start:end] for start, end in ranges)
+                        verify_stripped(path, kept, tmp_path)
+
+                shutil.copymode(path, tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    return removed
@@ -1,8 +1,15 @@
 import os
 import sys
 import argparse
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
+import multiprocessing
+from PIL.ExifTags import GPSTAGS
+
+from exif_gps import GPS_INFO_TAG, read_gps
+from geotag_index import DEFAULT_INDEX_PATH, GeotagIndex
+from geotag_output import FORMATS, RecordWriter, gps_record
+from geo_query import GridIndex
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.webp'}
 
 def convert_gps_coordinates(coordinates, ref):
     """Convert GPS coordinates to decimal degrees."""
@@ -14,17 +21,12 @@ def convert_gps_coordinates(coordinates, ref):
 
 def get_geotagging(exif):
     """Extract GPS information from EXIF data."""
-    geotagging = {}
-    for (idx, tag) in TAGS.items():
-        if tag == 'GPSInfo':
-            if idx not in exif:
-                return None
-            
-            gps_data = exif[idx]
-            for (key, val) in GPSTAGS.items():
-                if key in gps_data:
-                    geotagging[val] = gps_data[key]
-    
+    if GPS_INFO_TAG not in exif:
+        return None
+
+    gps_data = exif[GPS_INFO_TAG]
+    geotagging = {GPSTAGS[key]: gps_data[key] for key in sorted(gps_data) if key in GPSTAGS}
+
     # Convert coordinates to decimal degrees and generate Maps URL
     if all(k in geotagging for k in ['GPSLatitude', 'GPSLatitudeRef', 'GPSLongitude', 'GPSLongitudeRef']):
         lat = convert_gps_coordinates(geotagging['GPSLatitude'], geotagging['GPSLatitudeRef'])
@@ -35,36 +37,163 @@ def get_geotagging(exif):
     
     return geotagging
 
-def scan_directory(directory, strip=False):
-    """Scan directory recursively for images with geotag info."""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.webp'}
-    
+def find_images(directory):
+    """Recursively yield image paths under directory."""
     for root, _, files in os.walk(directory):
         for file in files:
-            if os.path.splitext(file.lower())[1] in image_extensions:
-                image_path = os.path.join(root, file)
-                
-                try:
-                    image = Image.open(image_path)
-                    exif = image._getexif()
-                    
-                    if exif:
-                        geotagging = get_geotagging(exif)
-                        
-                        if geotagging and 'GoogleMapsURL' in geotagging:
-                            print(f"Geotag found in {image_path}:")
-                            for tag, value in geotagging.items():
-                                print(f"  {tag}: {value}")
-                
-                except Exception as e:
-                    print(f"Error processing {image_path}: {e}")
+            if os.path.splitext(file.lower())[1] in IMAGE_EXTENSIONS:
+                yield os.path.join(root, file)
+
+def scan_file(image_path):
+    """Returns (image_path, geotagging or None, error or None)."""
+    try:
+        gps_data = read_gps(image_path)
+        if gps_data:
+            return image_path, get_geotagging({GPS_INFO_TAG: gps_data}), None
+        return image_path, None, None
+    except Exception as e:
+        return image_path, None, str(e)
+
+def print_result(image_path, geotagging, error):
+    if error is not None:
+        print(f"Error processing {image_path}: {error}")
+    elif geotagging and 'GoogleMapsURL' in geotagging:
+        print(f"Geotag found in {image_path}:")
+        for tag, value in geotagging.items():
+            print(f"  {tag}: {value}")
+
+def scan_results(directory, jobs=1, index_path=None):
+    """
+    Yield (image_path, geotagging, error) for the images under directory.
+    With jobs > 1 files are read in a process pool and yielded as they
+    finish. With an index only new and changed files are read and the
+    results come from the index.
+    """
+    image_paths = find_images(directory)
+
+    if index_path:
+        index = GeotagIndex(index_path)
+        try:
+            scanned, unchanged, removed = index.update(image_paths, directory, scan_file, jobs)
+            print(f"Index: {scanned} files read, {unchanged} unchanged, {removed} removed", file=sys.stderr)
+            yield from index.results(directory)
+        finally:
+            index.close()
+        return
+
+    if jobs > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            yield from pool.imap_unordered(scan_file, image_paths, chunksize=32)
+    else:
+        for image_path in image_paths:
+            yield scan_file(image_path)
+
+def scan_directory(directory, strip=False, jobs=1, index_path=None, output_format='text'):
+    """Scan directory recursively for images with geotag info."""
+    results = scan_results(directory, jobs, index_path)
+
+    if output_format == 'text':
+        for result in results:
+            print_result(*result)
+        return
+
+    # Structured output is for other programs, keep errors out of it
+    writer = RecordWriter(sys.stdout, output_format)
+    try:
+        for image_path, geotagging, error in results:
+            if error is not None:
+                print(f"Error processing {image_path}: {error}", file=sys.stderr)
+            elif geotagging and 'GoogleMapsURL' in geotagging:
+                writer.write(gps_record(image_path, geotagging))
+    finally:
+        writer.close()
+
+def parse_query(text):
+    """'near LAT LON KM' or 'bbox SOUTH WEST NORTH EAST', commas allowed."""
+    words = text.replace(',', ' ').split()
+    if len(words) == 4 and words[0] == 'near':
+        return ('near',) + tuple(float(word) for word in words[1:])
+    if len(words) == 5 and words[0] == 'bbox':
+        return ('bbox',) + tuple(float(word) for word in words[1:])
+    raise ValueError(f"Invalid query: {text!r}, expected 'near LAT LON KM' or 'bbox SOUTH WEST NORTH EAST'")
+
+def run_query(grid, query, output_format='text'):
+    if query[0] == 'near':
+        matches = grid.radius(*query[1:])
+    else:
+        matches = [(None, record, lat, lon) for record, lat, lon in grid.bbox(*query[1:])]
+
+    if output_format == 'text':
+        for distance, record, lat, lon in matches:
+            prefix = f"{distance:10.3f} km  " if distance is not None else ''
+            print(f"{prefix}{record['path']}  {lat:.6f}, {lon:.6f}")
+        print(f"{len(matches)} images", file=sys.stderr)
+        return
+
+    writer = RecordWriter(sys.stdout, output_format)
+    try:
+        for distance, record, lat, lon in matches:
+            if distance is not None:
+                record = dict(record, distance_km=round(distance, 4))
+            writer.write(record)
+    finally:
+        writer.close()
+
+def query_directory(directory, queries, jobs=1, index_path=None, output_format='text', interactive=False):
+    """
+    Load the geotagged images under directory into a grid index, then
+    answer the queries, and with interactive=True more queries from stdin.
+    """
+    grid = GridIndex(
+        (gps_record(image_path, geotagging), geotagging['DecimalLatitude'], geotagging['DecimalLongitude'])
+        for image_path, geotagging, error in scan_results(directory, jobs, index_path)
+        if geotagging and 'GoogleMapsURL' in geotagging
+    )
+    print(f"{len(grid)} geotagged images", file=sys.stderr)
+
+    for query in queries:
+        run_query(grid, query, output_format)
+
+    if interactive:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                query = parse_query(line.strip())
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                continue
+            run_query(grid, query, output_format)
 
 def main():
     parser = argparse.ArgumentParser(description='Scan images for geotag information.')
     parser.add_argument('directory', help='Directory to scan')
-    
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of processes reading files in parallel')
+    parser.add_argument('--index', nargs='?', const=DEFAULT_INDEX_PATH,
+                        help=f'Keep results in a SQLite index and only read new or changed files (default: {DEFAULT_INDEX_PATH})')
+
+    parser.add_argument('--format', choices=FORMATS, default='text',
+                        help='Output format, structured formats are streamed as results arrive')
+    parser.add_argument('--near', action='append', default=[], metavar='LAT,LON,KM',
+                        help='Only list images within KM of a point, nearest first (write --near=-33.9,18.4,5 for negative values)')
+    parser.add_argument('--bbox', action='append', default=[], metavar='SOUTH,WEST,NORTH,EAST',
+                        help='Only list images inside a bounding box')
+    parser.add_argument('--interactive', action='store_true',
+                        help="Read more 'near LAT LON KM' / 'bbox SOUTH WEST NORTH EAST' queries from stdin")
+
     args = parser.parse_args()
-    scan_directory(args.directory)
+
+    try:
+        queries = ([parse_query('near ' + near) for near in args.near]
+                   + [parse_query('bbox ' + bbox) for bbox in args.bbox])
+    except ValueError as e:
+        parser.error(str(e))
+
+    if queries or args.interactive:
+        query_directory(args.directory, queries, args.jobs, args.index, args.format, args.interactive)
+    else:
+        scan_directory(args.directory, jobs=args.jobs, index_path=args.index, output_format=args.format)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
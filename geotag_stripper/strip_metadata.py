@@ -1,6 +1,15 @@
 import os
+import queue
 import argparse
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from exiftool import INSTALL_HINT, ExifToolPool, exiftool_version
+from metadata_probe import CATEGORIES, probe
+from native_strip import NATIVE_EXTENSIONS, strip_image
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.webp'}
 
 def remove_metadata(image_path):
     """Remove all metadata from an image using exiftool."""
@@ -26,22 +35,177 @@ def remove_metadata(image_path):
     except Exception as e:
         print(f"Unexpected error processing {image_path}: {e}")
 
-def scan_directory(directory):
-    """Recursively scan directory and remove metadata from images."""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.webp'}
-    
+def find_images(directory):
+    """Recursively yield image paths under directory."""
     for root, _, files in os.walk(directory):
         for file in files:
-            if os.path.splitext(file.lower())[1] in image_extensions:
-                image_path = os.path.join(root, file)
-                remove_metadata(image_path)
+            if os.path.splitext(file.lower())[1] in IMAGE_EXTENSIONS:
+                yield os.path.join(root, file)
+
+def strip_native(image_path, verify=False):
+    """Strip a JPEG or PNG without exiftool, returns (path, ok, message)."""
+    try:
+        removed = strip_image(image_path, verify)
+    except (OSError, ValueError) as e:
+        return image_path, False, str(e)
+
+    # None means there was nothing to strip
+    return image_path, True, f"{removed} segments" if removed else None
+
+def scan_directory(directory, workers=4, native=True, verify=False):
+    """Recursively scan directory and remove metadata from images."""
+    counts = {'stripped': 0, 'clean': 0, 'errors': 0}
+
+    def report(image_path, ok, message):
+        if not ok:
+            counts['errors'] += 1
+            print(f"Error removing metadata from {image_path}: {message}")
+        elif message is None:
+            counts['clean'] += 1
+        else:
+            counts['stripped'] += 1
+            print(f"Metadata removed from {image_path}")
+
+    # JPEG and PNG are stripped natively, everything else by exiftool
+    fallback = []
+
+    def native_images():
+        for image_path in find_images(directory):
+            if native and os.path.splitext(image_path.lower())[1] in NATIVE_EXTENSIONS:
+                yield image_path
+            else:
+                fallback.append(image_path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(lambda path: strip_native(path, verify), native_images()):
+            report(*result)
+
+    if fallback:
+        try:
+            version = exiftool_version()
+        except FileNotFoundError:
+            print(f"Error: exiftool is not installed, skipping {len(fallback)} images. {INSTALL_HINT}")
+            counts['errors'] += len(fallback)
+            fallback = []
+        else:
+            print(f"Using exiftool {version} with {workers} workers for {len(fallback)} images")
+
+    if fallback:
+        pool = ExifToolPool(workers)
+        try:
+            for result in pool.strip(fallback):
+                report(*result)
+        finally:
+            pool.close()
+
+    print(f"Stripped {counts['stripped']} images, {counts['clean']} already clean, {counts['errors']} errors")
+
+def probe_file(image_path):
+    """Returns (image_path, metadata categories, error or None)."""
+    try:
+        return image_path, probe(image_path), None
+    except Exception as e:
+        return image_path, set(), str(e)
+
+def strip_dirty(directory, workers=4, categories=CATEGORIES, native=True, verify=False):
+    """
+    Strip only the images that carry metadata in one of categories. Files
+    are probed in one thread pool and each dirty one is handed to the
+    strippers as soon as it's found, so probing and stripping overlap.
+    Clean files are never rewritten.
+    """
+    categories = set(categories)
+    counts = {'scanned': 0, 'dirty': 0, 'stripped': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def report(image_path, ok, message):
+        with lock:
+            if not ok:
+                counts['errors'] += 1
+                print(f"Error removing metadata from {image_path}: {message}")
+            elif message is not None:
+                counts['stripped'] += 1
+                print(f"Metadata removed from {image_path}")
+
+    # Dirty files that need exiftool, None ends the stream
+    fallback = queue.Queue()
+    exiftool_thread = None
+    exiftool_missing = False
+
+    def run_exiftool():
+        pool = ExifToolPool(workers)
+        try:
+            for result in pool.strip(iter(fallback.get, None)):
+                report(*result)
+        finally:
+            pool.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as probe_executor, \
+                ThreadPoolExecutor(max_workers=workers) as strip_executor:
+            for image_path, found, error in probe_executor.map(probe_file, find_images(directory)):
+                with lock:
+                    counts['scanned'] += 1
+                if error is not None:
+                    report(image_path, False, error)
+                    continue
+                if not found & categories:
+                    continue
+
+                with lock:
+                    counts['dirty'] += 1
+
+                if native and os.path.splitext(image_path.lower())[1] in NATIVE_EXTENSIONS:
+                    future = strip_executor.submit(strip_native, image_path, verify)
+                    future.add_done_callback(lambda future: report(*future.result()))
+                    continue
+
+                if exiftool_thread is None and not exiftool_missing:
+                    try:
+                        print(f"Using exiftool {exiftool_version()} for formats other than JPEG and PNG")
+                    except FileNotFoundError:
+                        print(f"Error: exiftool is not installed. {INSTALL_HINT}")
+                        exiftool_missing = True
+                    else:
+                        exiftool_thread = threading.Thread(target=run_exiftool, name='exiftool')
+                        exiftool_thread.start()
+
+                if exiftool_missing:
+                    report(image_path, False, 'exiftool is not installed')
+                else:
+                    fallback.put(image_path)
+    finally:
+        if exiftool_thread is not None:
+            fallback.put(None)
+            exiftool_thread.join()
+
+    print(f"Scanned {counts['scanned']} images, {counts['dirty']} with metadata, "
+          f"stripped {counts['stripped']}, {counts['errors']} errors")
 
 def main():
-    parser = argparse.ArgumentParser(description='Remove metadata from images using exiftool.')
+    parser = argparse.ArgumentParser(description='Remove metadata from images.')
     parser.add_argument('directory', help='Directory to scan')
-    
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Number of files (and exiftool processes) to process in parallel')
+    parser.add_argument('--exiftool-only', action='store_true',
+                        help='Use exiftool for JPEG and PNG too instead of stripping them natively')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check that natively stripped files keep the exact image data')
+    parser.add_argument('--only-dirty', action='store_true',
+                        help='Probe each image first and only rewrite the ones that carry metadata')
+    parser.add_argument('--categories', default=','.join(CATEGORIES),
+                        help=f'With --only-dirty, metadata that makes a file dirty (default: {",".join(CATEGORIES)})')
+
     args = parser.parse_args()
-    scan_directory(args.directory)
+
+    if args.only_dirty:
+        categories = [category.strip() for category in args.categories.split(',') if category.strip()]
+        unknown = set(categories) - set(CATEGORIES)
+        if unknown:
+            parser.error(f"Unknown categories: {', '.join(sorted(unknown))}")
+        strip_dirty(args.directory, args.workers, categories, not args.exiftool_only, args.verify)
+    else:
+        scan_directory(args.directory, args.workers, not args.exiftool_only, args.verify)
 
 if __name__ == "__main__":
     main()
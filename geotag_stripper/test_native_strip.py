@@ -0,0 +1,191 @@
+"""
+Tests for native_strip: metadata is removed and the image data is copied
+byte for byte.
+"""
+import io
+import os
+
+import pytest
+from PIL import Image, PngImagePlugin
+
+from native_strip import jpeg_ranges, png_ranges, strip_image
+
+XMP = b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF/></x:xmpmeta>'
+
+
+def _exif():
+    exif = Image.Exif()
+    exif[0x010F] = 'Canon'
+    exif[0x8825] = {1: 'N', 2: (37.0, 46.0, 30.0), 3: 'W', 4: (122.0, 25.0, 10.0)}
+    return exif.tobytes()
+
+
+def _image():
+    # Some structure so the encoders have real work to do
+    image = Image.new('RGB', (64, 48))
+    image.putdata([(x * 4, y * 5, (x ^ y) * 3) for y in range(48) for x in range(64)])
+    return image
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _image_data(path):
+    with Image.open(path) as image:
+        return image.tobytes()
+
+
+def _png_chunks(data, chunk_type):
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], 'big')
+        if data[pos + 4:pos + 8] == chunk_type:
+            chunks.append(data[pos:pos + 12 + length])
+        pos += 12 + length
+    return chunks
+
+
+@pytest.fixture
+def jpeg(tmp_path):
+    path = str(tmp_path / 'photo.jpg')
+    _image().save(path, exif=_exif(), comment=b'taken with a phone', xmp=XMP)
+    return path
+
+
+@pytest.fixture
+def png(tmp_path):
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Comment', 'plain text')
+    info.add_text('Software', 'compressed text', zip=True)
+    info.add_itxt('Description', 'international text')
+    path = str(tmp_path / 'photo.png')
+    _image().save(path, pnginfo=info, exif=_exif())
+    return path
+
+
+def test_jpeg_metadata_removed(jpeg):
+    original = _read(jpeg)
+    assert jpeg_ranges(io.BytesIO(original))[1] == 3
+
+    assert strip_image(jpeg) == 3
+
+    stripped = _read(jpeg)
+    assert jpeg_ranges(io.BytesIO(stripped))[1] == 0
+    with Image.open(jpeg) as image:
+        assert not image.getexif()
+        assert 'comment' not in image.info
+        assert 'xmp' not in image.info
+
+
+def test_jpeg_image_data_unchanged(jpeg):
+    original = _read(jpeg)
+    pixels = _image_data(jpeg)
+
+    strip_image(jpeg)
+
+    stripped = _read(jpeg)
+    # Everything from the start of scan on is copied as is
+    assert stripped[stripped.index(b'\xff\xda'):] == original[original.index(b'\xff\xda'):]
+    assert _image_data(jpeg) == pixels
+
+
+def test_png_metadata_removed(png):
+    original = _read(png)
+    assert png_ranges(io.BytesIO(original))[1] == 4
+
+    assert strip_image(png) == 4
+
+    stripped = _read(png)
+    assert png_ranges(io.BytesIO(stripped))[1] == 0
+    for chunk_type in (b'tEXt', b'zTXt', b'iTXt', b'eXIf'):
+        assert not _png_chunks(stripped, chunk_type)
+
+
+def test_png_image_data_unchanged(png):
+    original = _read(png)
+    pixels = _image_data(png)
+
+    strip_image(png)
+
+    stripped = _read(png)
+    for chunk_type in (b'IHDR', b'IDAT', b'IEND'):
+        assert _png_chunks(stripped, chunk_type) == _png_chunks(original, chunk_type)
+    assert _image_data(png) == pixels
+
+
+@pytest.mark.parametrize('name', ['clean.jpg', 'clean.png'])
+def test_clean_file_untouched(tmp_path, name):
+    path = str(tmp_path / name)
+    _image().save(path)
+    before = os.stat(path)
+
+    assert strip_image(path) == 0
+
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_jpeg_fill_bytes(tmp_path, jpeg):
+    # Padding before a marker is allowed and must survive
+    original = _read(jpeg)
+    padded = original[:2] + b'\xff\xff\xff' + original[2:]
+    path = str(tmp_path / 'padded.jpg')
+    with open(path, 'wb') as f:
+        f.write(padded)
+
+    assert strip_image(path) == 3
+    assert _image_data(path) == _image_data(jpeg)
+
+
+@pytest.mark.parametrize('fixture', ['jpeg', 'png'])
+def test_verify(request, fixture):
+    assert strip_image(request.getfixturevalue(fixture), verify=True) > 0
+
+
+def _corrupt(tmp_path, name, data):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def _assert_rejected(tmp_path, path, match):
+    before = _read(path)
+    with pytest.raises(ValueError, match=match):
+        strip_image(path)
+    # Left alone, and no temporary file behind
+    assert _read(path) == before
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.strip-')]
+
+
+def test_jpeg_corrupt(tmp_path, jpeg):
+    original = _read(jpeg)
+    app1 = original.index(b'\xff\xe1')
+
+    cases = {
+        'empty.jpg': (b'', 'Empty file'),
+        'not.jpg': (b'GIF89a' + original[6:], 'Not a JPEG'),
+        # Segment length runs past the end of the file
+        'length.jpg': (original[:app1 + 2] + b'\xff\xff' + original[app1 + 4:app1 + 40],
+                       'bad segment length'),
+        'cut.jpg': (original[:app1 + 3], 'truncated segment'),
+        'marker.jpg': (original[:2] + b'\xff\xff', 'truncated marker'),
+        'nomarker.jpg': (original[:2] + b'\x00' + original[2:], 'no marker'),
+    }
+    for name, (data, match) in cases.items():
+        _assert_rejected(tmp_path, _corrupt(tmp_path, name, data), match)
+
+
+def test_png_corrupt(tmp_path, png):
+    original = _read(png)
+
+    cases = {
+        'not.png': (b'\x89PNX' + original[4:], 'Not a PNG'),
+        'cut.png': (original[:12], 'truncated chunk'),
+        'length.png': (original[:8] + b'\x7f\xff\xff\xff' + original[12:], 'bad chunk length'),
+    }
+    for name, (data, match) in cases.items():
+        _assert_rejected(tmp_path, _corrupt(tmp_path, name, data), match)
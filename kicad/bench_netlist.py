@@ -0,0 +1,207 @@
+#!/usr/bin/python
+''' Benchmark KiCadNetlistReader on synthetic netlists from a large board
+
+Writes the same random board as a KiCad 5 netlist and as a KiCad 8 one
+and times reading both. The KiCad 5 one is also read with the line by
+line regex reader used before, which can't read the KiCad 8 layout, and
+the results are checked against each other. Then compares the memory
+the reader holds on to with the dicts of dicts it used to build, and
+times connectivity lookups against walking those dicts.
+
+Example usage:
+bench_netlist.py --components 20000
+'''
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from kicadnetlistreader import KiCadNetlistReader
+
+legacy_comp_re = re.compile('\(comp \(ref ([A-Z]+[0-9]+)\)')
+legacy_net_re = re.compile('\(net \(code ([0-9])+\) \(name \/?(.+)\)')
+legacy_node_re = re.compile('\(node \(ref ([A-Za-z]+[0-9]+)\) \(pin ([0-9]+)\)\)')
+
+def read_legacy(filename):
+    ''' Components and nets the way the regex reader found them '''
+    components = {}
+    nets = {}
+    mode = None
+    net = None
+    with open(filename) as file:
+        for line in file:
+            line = line.strip()
+            if line in ('(components', '(libparts', '(libraries', '(nets'):
+                mode = line[1:]
+            if mode == 'components':
+                m = legacy_comp_re.match(line)
+                if m:
+                    components.setdefault(m.group(1), {})
+            elif mode == 'nets':
+                m = legacy_net_re.match(line)
+                if m:
+                    net = m.group(2)
+                    nets.setdefault(net, {})
+                    continue
+                m = legacy_node_re.match(line)
+                if m:
+                    nets[net].setdefault(m.group(1), []).append(m.group(2))
+    return components, nets
+
+def make_board(rng, count):
+    ''' [(refdes, part, pin count)] and {net name: [(refdes, pin)]} '''
+    parts = [('R', 'R', 2), ('C', 'C', 2), ('U', 'STM32F4', 64), ('U', 'SN74LVC1G', 5), ('J', 'Conn_01x10', 10)]
+    components = []
+    numbers = {}
+    for _ in range(count):
+        prefix, part, pins = rng.choice(parts)
+        numbers[prefix] = numbers.get(prefix, 0) + 1
+        components.append((prefix + str(numbers[prefix]), part, pins))
+
+    nets = {}
+    for refdes, part, pins in components:
+        for pin in range(1, pins + 1):
+            pin = str(pin)
+            roll = rng.random()
+            if roll < 0.1:
+                name = rng.choice(['GND', '+3V3', '+5V'])
+            elif roll < 0.3:
+                name = 'Net-(' + refdes + '-Pad' + pin + ')'
+            else:
+                name = 'SIG' + str(rng.randrange(count))
+            nets.setdefault(name, []).append((refdes, pin))
+    return components, nets
+
+def write_kicad5(file, components, nets):
+    w = file.write
+    w('(export (version D)\n  (design\n    (source board.sch)\n    (tool "Eeschema 5.1.10"))\n')
+    w('  (components\n')
+    for refdes, part, pins in components:
+        w('    (comp (ref ' + refdes + ')\n      (value ' + part + ')\n')
+        w('      (footprint Package:' + part + ')\n')
+        w('      (libsource (lib Device) (part ' + part + ') (description "' + part + ' part"))\n')
+        w('      (sheetpath (names /) (tstamps /))\n      (tstamp 5C3F1A2B))\n')
+    w('  )\n  (libparts\n')
+    for part, pins in sorted({(part, pins) for _, part, pins in components}):
+        w('    (libpart (lib Device) (part ' + part + ')\n      (pins\n')
+        for pin in range(1, pins + 1):
+            w('        (pin (num ' + str(pin) + ') (name P' + str(pin) + ') (type passive))\n')
+        w('      ))\n')
+    w('  )\n  (nets\n')
+    for code, (name, nodes) in enumerate(nets.items(), 1):
+        quoted = '"' + name + '"' if '(' in name else '/' + name
+        w('    (net (code ' + str(code) + ') (name ' + quoted + ')\n')
+        for refdes, pin in nodes:
+            w('      (node (ref ' + refdes + ') (pin ' + pin + '))\n')
+        w('    )\n')
+    w('  ))\n')
+
+def write_kicad8(file, components, nets):
+    w = file.write
+    w('(export\n  (version "E")\n  (design\n    (source "board.kicad_sch")\n    (tool "Eeschema 8.0.4"))\n')
+    w('  (components\n')
+    for refdes, part, pins in components:
+        w('    (comp\n      (ref "' + refdes + '")\n      (value "' + part + '")\n')
+        w('      (footprint "Package:' + part + '")\n')
+        w('      (libsource\n        (lib "Device")\n        (part "' + part + '")\n        (description "' + part + ' part"))\n')
+        w('      (property\n        (name "Sheetname")\n        (value "Root"))\n')
+        w('      (sheetpath\n        (names "/")\n        (tstamps "/"))\n      (tstamps "8a1c5e2b-9f3d"))\n')
+    w('  )\n  (libparts\n')
+    for part, pins in sorted({(part, pins) for _, part, pins in components}):
+        w('    (libpart\n      (lib "Device")\n      (part "' + part + '")\n      (pins\n')
+        for pin in range(1, pins + 1):
+            w('        (pin\n          (num "' + str(pin) + '")\n          (name "P' + str(pin) + '")\n          (type "passive"))\n')
+        w('      ))\n')
+    w('  )\n  (nets\n')
+    for code, (name, nodes) in enumerate(nets.items(), 1):
+        name = name if '(' in name else '/' + name
+        w('    (net\n      (code "' + str(code) + '")\n      (name "' + name + '")\n      (class "Default")\n')
+        for refdes, pin in nodes:
+            w('      (node\n        (ref "' + refdes + '")\n        (pin "' + pin + '")\n        (pintype "passive"))\n')
+        w('    )\n')
+    w('  ))\n')
+
+def bench(name, fn, filename):
+    start = time.perf_counter()
+    result = fn(filename)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(filename) / 1e6
+    print('%-8s %6.1f MB %10.1f ms %8.1f MB/s' % (name, size, elapsed * 1000, size / elapsed))
+    return result, elapsed
+
+def retained(fn, *args):
+    ''' Result of fn and the bytes it still holds once it returns '''
+    tracemalloc.start()
+    result = fn(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def materialize(reader):
+    ''' The dicts of dicts the reader used to keep '''
+    return (
+        {refdes: dict(c, pins=dict(c['pins'])) for refdes, c in reader.components.items()},
+        {name: dict(p, pins=dict(p['pins'])) for name, p in reader.parts.items()},
+        {name: n for name, n in reader.nets.items()},
+    )
+
+def shared_nets_walk(nets, refs):
+    ''' Nets touching all of refs, the way the dicts had to be searched '''
+    return sorted(name for name, net in nets.items() if all(r in net['nodes'] for r in refs))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark netlist reading.')
+    parser.add_argument('--components', type=int, default=10000, help='Number of components')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    args = parser.parse_args()
+
+    components, nets = make_board(random.Random(args.seed), args.components)
+
+    with tempfile.TemporaryDirectory() as directory:
+        v5 = os.path.join(directory, 'board5.net')
+        v8 = os.path.join(directory, 'board8.net')
+        with open(v5, 'w') as file:
+            write_kicad5(file, components, nets)
+        with open(v8, 'w') as file:
+            write_kicad8(file, components, nets)
+
+        (legacy_components, legacy_nets), legacy_time = bench('legacy', read_legacy, v5)
+        reader5, new_time = bench('kicad5', KiCadNetlistReader, v5)
+        reader8, _ = bench('kicad8', KiCadNetlistReader, v8)
+
+    # The regex reader kept the quotes around quoted net names
+    legacy_nets = {name.strip('"'): nodes for name, nodes in legacy_nets.items()}
+    assert set(reader5.components) == set(legacy_components)
+    assert {name: net['nodes'] for name, net in reader5.nets.items()} == legacy_nets
+    assert reader5.components == reader8.components
+    assert reader5.parts == reader8.parts
+    assert {name: net['nodes'] for name, net in reader5.nets.items()} == \
+        {name: net['nodes'] for name, net in reader8.nets.items()}
+
+    print('kicad5 vs legacy: %.2fx' % (legacy_time / new_time))
+
+    with tempfile.TemporaryDirectory() as directory:
+        v8 = os.path.join(directory, 'board8.net')
+        with open(v8, 'w') as file:
+            write_kicad8(file, components, nets)
+        reader, model_size = retained(KiCadNetlistReader, v8)
+    dicts, dicts_size = retained(materialize, reader)
+    print('model    %8.1f MB' % (model_size / 1e6))
+    print('dicts    %8.1f MB (strings shared with the model)' % (dicts_size / 1e6))
+
+    rng = random.Random(args.seed)
+    queries = [tuple(rng.sample(list(reader.components), 2)) for _ in range(20)]
+    start = time.perf_counter()
+    walked = [shared_nets_walk(dicts[2], refs) for refs in queries]
+    walk_time = (time.perf_counter() - start) / len(queries)
+    start = time.perf_counter()
+    indexed = [reader.sharedNets(*refs) for refs in queries]
+    index_time = (time.perf_counter() - start) / len(queries)
+    assert walked == indexed
+    print('shared nets: walk %.3f ms, indexed %.3f ms' % (walk_time * 1000, index_time * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -1,132 +1,333 @@
-''' Class to read in kicad netlist into python dictionaries '''
+''' Class to read in kicad netlist into python objects
+
+The netlist is an S-expression. It's tokenized in chunks as the file is
+read and each comp, libpart and net is handed over as soon as its closing
+paren is seen, so only one of them is in memory at a time and line breaks
+and spacing don't matter. Works with the KiCad 5 and KiCad 6/7/8 layouts.
+
+Components, parts and nets are kept as __slots__ objects with interned
+names and pin numbers, and net to nodes, component to pins and part to
+components are all indexed, so connectivity questions are lookups. The
+components, parts and nets dicts of dicts from before are still there
+as read only views.
+'''
 import re
+from collections.abc import Mapping
+from sys import intern
+
+# Bytes read from the netlist at a time
+CHUNK_SIZE = 1 << 20
+
+# Every non-whitespace character belongs to one of these. Most of a
+# netlist is (name value) lists, those come out as one token to save
+# work in the parser. A string that isn't closed yet runs to the end of
+# the buffer.
+token_re = re.compile(
+    r'\(\s*[^\s()"]+\s+(?:[^\s()"]+|"(?:[^"\\]|\\.)*")\s*\)'
+    r'|[()]|"(?:[^"\\]|\\.?)*"?|[^\s()"]+',
+    re.DOTALL,
+)
+escape_re = re.compile(r'\\(.)', re.DOTALL)
+
+# Lists right inside these top level sections are handed to the reader
+SECTIONS = ('components', 'libparts', 'nets')
+
+def tokenize(file, chunk_size=CHUNK_SIZE):
+    ''' Yield lists of tokens from a file, one list per chunk read '''
+    pending = ''
+    while True:
+        chunk = file.read(chunk_size)
+        buffer = pending + chunk
+        tokens = token_re.findall(buffer)
+
+        # The last token may carry on in the next chunk if it runs to the
+        # end of the buffer, strings can end in whitespace
+        pending = ''
+        if chunk and tokens and buffer.endswith(tokens[-1]):
+            pending = tokens.pop()
+
+        if tokens:
+            yield tokens
+        if not chunk:
+            return
+
+def unquote(token):
+    if len(token) < 2 or token[-1] != '"':
+        raise ValueError('Unterminated string in netlist: ' + token[:40])
+    token = token[1:-1]
+    if '\\' in token:
+        token = escape_re.sub(r'\1', token)
+    return token
+
+def iter_items(file, sections=SECTIONS):
+    ''' Yield (section, item) for each list inside one of the top level
+        sections. Items are nested lists of strings, e.g.
+        ['comp', ['ref', 'U3'], ['value', '10k'], ...] '''
+    stack = []
+    current = None
+    for tokens in tokenize(file):
+        for token in tokens:
+            first = token[0]
+            if first == '(':
+                if len(token) == 1:
+                    stack.append(current)
+                    current = []
+                    continue
+                if current is None:
+                    raise ValueError('Netlist is not an S-expression')
+
+                name, value = token[1:-1].split(None, 1)
+                value = value.rstrip()
+                if value[0] == '"':
+                    value = unquote(value)
+                if len(stack) == 2 and current and current[0] in sections:
+                    yield current[0], [name, value]
+                else:
+                    current.append([name, value])
+            elif first == ')':
+                if current is None:
+                    raise ValueError('Unbalanced ) in netlist')
+                item = current
+                current = stack.pop()
+                if current is None:
+                    continue
+                if len(stack) == 2 and current and current[0] in sections:
+                    yield current[0], item
+                else:
+                    current.append(item)
+            elif current is None:
+                raise ValueError('Netlist is not an S-expression')
+            elif first == '"':
+                current.append(unquote(token))
+            else:
+                current.append(token)
+
+    if current is not None:
+        raise ValueError('Unexpected end of netlist')
+
+def fields(item):
+    ''' {name: list} for the sub lists of an item, first one wins '''
+    found = {}
+    for child in item[1:]:
+        if isinstance(child, list) and child and child[0] not in found:
+            found[child[0]] = child
+    return found
+
+def leaves(item, *names):
+    ''' Values of the named (name value) lists of an item, None for the
+        missing ones. Cheaper than fields() for the many small lists. '''
+    found = [None] * len(names)
+    for child in item[1:]:
+        if isinstance(child, list) and len(child) == 2 and child[0] in names:
+            i = names.index(child[0])
+            if found[i] is None and not isinstance(child[1], list):
+                found[i] = child[1]
+    return found
+
+def value(field, default=None):
+    ''' The value of a (name value) list, or default if it's missing '''
+    if field is None or len(field) < 2 or isinstance(field[1], list):
+        return default
+    return field[1]
+
+class Component(object):
+    ''' A placed component. pins maps pin number to net name, the value,
+        footprint, lib and part are None if the netlist didn't have them. '''
+    __slots__ = ('refdes', 'value', 'footprint', 'lib', 'part', 'pins')
+
+    def __init__(self, refdes, value=None, footprint=None, lib=None, part=None):
+        self.refdes = refdes
+        self.value = value
+        self.footprint = footprint
+        self.lib = lib
+        self.part = part
+        self.pins = {}
+
+    def asdict(self):
+        d = {'pins':self.pins}
+        for key in ('value', 'footprint', 'lib', 'part'):
+            if getattr(self, key) is not None:
+                d[key] = getattr(self, key)
+        return d
+
+class Part(object):
+    ''' A library part. pins maps pin number to pin name. '''
+    __slots__ = ('name', 'lib', 'pins')
+
+    def __init__(self, name, lib, pins):
+        self.name = name
+        self.lib = lib
+        self.pins = pins
+
+    def asdict(self):
+        return {'pins':self.pins, 'lib':self.lib}
+
+class Net(object):
+    ''' A net. Its nodes are kept as two parallel tuples, refs[i] pin pins[i]. '''
+    __slots__ = ('name', 'code', 'refs', 'pins')
+
+    def __init__(self, name, code, refs, pins):
+        self.name = name
+        self.code = code
+        self.refs = refs
+        self.pins = pins
+
+    def nodes(self):
+        return list(zip(self.refs, self.pins))
 
-comp_re = re.compile('\(comp \(ref ([A-Z]+[0-9]+)\)')
-comp_val_re = re.compile('\(value (.+)\)')
-comp_foot_re = re.compile('\(footprint (.+)\)')
-comp_part_re = re.compile('\(libsource \(lib (.+)\) \(part (.+)\)\)')
+    def asdict(self):
+        nodes = {}
+        for refdes, pin in zip(self.refs, self.pins):
+            nodes.setdefault(refdes, []).append(pin)
+        return {'code':self.code, 'nodes':nodes}
 
-part_re = re.compile('\(libpart \(lib (.+)\) \(part (.+)\)')
-part_pin_re = re.compile('\(pin \(num ([0-9A-Z-a-z]+)\) \(name (.+)\) \(type ([A-Za-z0-9_-]+)\)\)')
+class DictView(Mapping):
+    ''' Read only view of {name: object} as the {name: dict} the reader
+        used to build, the dicts are made on access '''
+    __slots__ = ('objects',)
 
-net_re = re.compile('\(net \(code ([0-9])+\) \(name \/?(.+)\)')
-net_node_re = re.compile('\(node \(ref ([A-Za-z]+[0-9]+)\) \(pin ([0-9]+)\)\)')
+    def __init__(self, objects):
+        self.objects = objects
+
+    def __getitem__(self, key):
+        return self.objects[key].asdict()
+
+    def __contains__(self, key):
+        return key in self.objects
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
 
 class KiCadNetlistReader(object):
     def __init__(self, filename):
-        self.mode = None
-
         self.modeproc = {
             'components': self.component_fn,
             'libparts': self.part_fn,
             'nets': self.netlist_fn,
         }
 
-        self.components = {}
-        self.nets = {}
-        self.parts = {}
+        # {refdes: Component}, {part name: Part}, {net name: Net}
+        self.component_table = {}
+        self.part_table = {}
+        self.net_table = {}
 
-        with open(filename) as file:
-            reading = True
-            while reading:
-                line = file.readline()
-                if line == '':
-                    break
+        # part name -> [refdes]
+        self.part_components = {}
 
-                self.processLine(line.strip())
+        # The dicts of dicts older code reads
+        self.components = DictView(self.component_table)
+        self.parts = DictView(self.part_table)
+        self.nets = DictView(self.net_table)
+
+        with open(filename) as file:
+            for section, item in iter_items(file):
+                self.modeproc[section](item)
 
             # Relate pins on component to net names
             self.updateComponents()
 
-    def component_fn(self, line):
-        # Component regex match
-        m = comp_re.match(line)
-        if m:
-            refdes = m.group(1)
-            if refdes not in self.components:
-                self.components[refdes]={'pins':{}}
-                self.current_refdes = refdes
+    def component_fn(self, item):
+        if item[0] != 'comp':
             return
+        f = fields(item)
 
-        # Value regex match
-        m = comp_val_re.match(line)
-        if m:
-            refdes = self.current_refdes
-            if refdes in self.components:
-                self.components[refdes]['value'] = m.group(1)
-
-        # Footprint regex match
-        m = comp_foot_re.match(line)
-        if m:
-            refdes = self.current_refdes
-            if refdes in self.components:
-                self.components[refdes]['footprint'] = m.group(1)
-
-        # Part regex match
-        m = comp_part_re.match(line)
-        if m:
-            refdes = self.current_refdes
-            if refdes in self.components:
-                self.components[refdes]['lib'] = m.group(1)
-                self.components[refdes]['part'] = m.group(2)
-
-    def part_fn(self, line):
-        # Part regex match
-        m = part_re.match(line)
-        if m:
-            name = m.group(2)
-            if name not in self.parts:
-                self.parts[name] = {'pins':{}, 'lib':m.group(1)}
-                self.current_part_name = name
+        refdes = value(f.get('ref'))
+        if refdes is None or refdes in self.component_table:
             return
+        refdes = intern(refdes)
+
+        component = Component(refdes)
+        if 'value' in f:
+            component.value = value(f['value'], '')
+        if 'footprint' in f:
+            component.footprint = intern(value(f['footprint'], ''))
+
+        libsource = f.get('libsource')
+        if libsource is not None:
+            lib, part = leaves(libsource, 'lib', 'part')
+            component.lib = intern(lib or '')
+            component.part = intern(part or '')
+            self.part_components.setdefault(component.part, []).append(refdes)
 
-        # pin regex match
-        m = part_pin_re.match(line)
-        if m:
-            part_name = self.current_part_name
-            if part_name in self.parts:
-                self.parts[part_name]['pins'][m.group(1)] = m.group(2)
-
-    def netlist_fn(self, line):
-        # Netlist regex match
-        m = net_re.match(line)
-        if m:
-            code = m.group(1)
-            name = m.group(2)
-
-            if name not in self.nets:
-                self.nets[name]={'code':code, 'nodes':{}}
-                self.current_net_name = name
+        self.component_table[refdes] = component
+
+    def part_fn(self, item):
+        if item[0] != 'libpart':
             return
+        f = fields(item)
 
-        # Node regex match
-        m = net_node_re.match(line)
-        if m:
-            net = self.current_net_name
-            if net in self.nets:
-                refdes = m.group(1)
-                if refdes not in self.nets[net]['nodes']:
-                    self.nets[net]['nodes'][refdes] = []
-                self.nets[net]['nodes'][refdes].append(m.group(2))
+        name = value(f.get('part'))
+        if name is None or name in self.part_table:
+            return
+        name = intern(name)
 
-    def updateComponents(self):
-        for net in self.nets:
-            for node in self.nets[net]['nodes']:
-                if self.components[node]:
-                    for pin in self.nets[net]['nodes'][node]:
-                        self.components[node]['pins'][pin] = net
-
-    def processLine(self, line):
-        if line == '(components':
-            self.mode = 'components'
+        pins = {}
+        for pin in f.get('pins', [])[1:]:
+            if isinstance(pin, list) and pin and pin[0] == 'pin':
+                num, pin_name = leaves(pin, 'num', 'name')
+                if num is not None:
+                    pins[intern(num)] = intern(pin_name or '')
+
+        self.part_table[name] = Part(name, intern(value(f.get('lib'), '')), pins)
+
+    def netlist_fn(self, item):
+        if item[0] != 'net':
+            return
+        f = fields(item)
+
+        name = value(f.get('name'))
+        if name is None:
             return
-        elif line == '(libparts':
-            self.mode = 'libparts'
+        # Drop the root sheet slash, /SDA is SDA
+        if name.startswith('/'):
+            name = name[1:]
+        if name in self.net_table:
             return
-        elif line == '(libraries':
-            self.mode = None
-        elif line == '(nets':
-            self.mode = 'nets'
+        name = intern(name)
+
+        refs = []
+        pins = []
+        for node in item[1:]:
+            if isinstance(node, list) and node and node[0] == 'node':
+                refdes, pin = leaves(node, 'ref', 'pin')
+                if refdes is not None and pin is not None:
+                    refs.append(intern(refdes))
+                    pins.append(intern(pin))
+
+        self.net_table[name] = Net(name, value(f.get('code'), ''), tuple(refs), tuple(pins))
+
+    def updateComponents(self):
+        for net in self.net_table.values():
+            for refdes, pin in zip(net.refs, net.pins):
+                component = self.component_table.get(refdes)
+                if component is not None:
+                    component.pins[pin] = net.name
+
+    def netNodes(self, net):
+        ''' [(refdes, pin)] connected to a net '''
+        return self.net_table[net].nodes()
+
+    def componentPins(self, refdes):
+        ''' {pin: net name} for a component '''
+        return self.component_table[refdes].pins
+
+    def componentNets(self, refdes):
+        ''' Set of nets a component touches '''
+        return set(self.component_table[refdes].pins.values())
+
+    def partComponents(self, part):
+        ''' Reference designators of the components using a library part '''
+        return self.part_components.get(part, [])
 
-        if self.mode in self.modeproc:
-            self.modeproc[self.mode](line)
+    def sharedNets(self, *refdes):
+        ''' Nets that touch every one of the given components, e.g.
+            sharedNets('U3', 'U7') '''
+        if not refdes:
+            return []
+        nets = self.componentNets(refdes[0])
+        for other in refdes[1:]:
+            nets &= self.componentNets(other)
+        return sorted(nets)
@@ -26,11 +26,22 @@ p_pins = reader.parts[reader.components[args.refdes]['part']]['pins']
 print('#ifndef __PINS_H__')
 print('#define __PINS_H__\n')
 
-for pin in sorted(p_pins.keys(), key=lambda x: int(x)):
+# Numbered pins in order, then BGA style ones like A1
+def pin_order(pin):
+    if pin.isdigit():
+        return (0, int(pin), '')
+    return (1, 0, pin)
+
+for pin in sorted(p_pins.keys(), key=pin_order):
     part_pin_name = p_pins.get(pin)
     component_pin_name = c_pins.get(pin)
 
-    if ('"Net-(' + args.refdes) in component_pin_name:
+    # Skip pins without a named net
+    if component_pin_name is None:
+        continue
+    if ('Net-(' + args.refdes + '-') in component_pin_name:
+        continue
+    if component_pin_name.startswith('unconnected-('):
         continue
 
     m = port_re.match(part_pin_name)